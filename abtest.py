@@ -0,0 +1,173 @@
+"""共通乱数法（CRN）による2つの設定のA/B比較
+
+2つの EventManager のテーブル（A と B）を、同じ一様乱数で同時に進める。
+乱数の使い道は (ラン, フェーズ, 用途) ごとに固定なので（batchsim.DRAWS_PER_PHASE）、
+A と B は同じイベント・ダイスの抽選を見る。差の分散が独立に回すより大幅に小さくなるので、
+同じ精度に必要なラン数が減る。
+
+クリア率と死亡フェーズ分布の信頼区間を出し、クリア率の差の信頼区間の半幅が
+precision 以下になったら自動で止まる。
+
+    python abtest.py content.json tuned.json --precision 0.001
+"""
+import argparse
+import sys
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+
+from engine import CONTENT_PATH, EventManager, load_content
+from batchsim import BatchSimulator, DRAWS_PER_PHASE
+
+BLOCK_RUNS = 100_000  # 停止判定までに回すラン数
+MIN_RUNS = 200_000  # これより少ないラン数では止めない（分散の推定が安定するまで）
+
+
+class PairedStats:
+    """対になった指標 (A, B) の和と二乗和（差の分散を出すため積も持つ）"""
+    __slots__ = ("n", "sum_a", "sum_b", "sum_aa", "sum_bb", "sum_ab")
+
+    def __init__(self):
+        self.n = 0
+        self.sum_a = self.sum_b = 0
+        self.sum_aa = self.sum_bb = self.sum_ab = 0
+
+    def add(self, a: np.ndarray, b: np.ndarray) -> None:
+        """0/1 の指標の配列を加える"""
+        a = a.astype(np.int64)
+        b = b.astype(np.int64)
+        self.n += len(a)
+        self.sum_a += int(a.sum())
+        self.sum_b += int(b.sum())
+        self.sum_aa += int((a * a).sum())
+        self.sum_bb += int((b * b).sum())
+        self.sum_ab += int((a * b).sum())
+
+    def mean(self, which: str) -> float:
+        return (self.sum_a if which == "a" else self.sum_b) / self.n
+
+    def variance(self, which: str) -> float:
+        """1ランあたりの分散（which は "a" / "b" / "diff"）"""
+        n = self.n
+        mean_a, mean_b = self.sum_a / n, self.sum_b / n
+        var_a = self.sum_aa / n - mean_a ** 2
+        var_b = self.sum_bb / n - mean_b ** 2
+        if which == "a":
+            return var_a
+        if which == "b":
+            return var_b
+        cov = self.sum_ab / n - mean_a * mean_b
+        return max(var_a + var_b - 2 * cov, 0.0)
+
+    def interval(self, which: str, z: float) -> Dict[str, float]:
+        """平均（diff は B - A）と信頼区間"""
+        mean = self.mean("b") - self.mean("a") if which == "diff" else self.mean(which)
+        half = z * (self.variance(which) / self.n) ** 0.5
+        return {"mean": mean, "low": mean - half, "high": mean + half, "half_width": half}
+
+
+class CrnComparison:
+    """共通乱数法による A/B 比較"""
+    def __init__(self, event_manager_a: EventManager, event_manager_b: EventManager,
+                 seed: Optional[int] = None, confidence: float = 0.95):
+        self.sim_a = BatchSimulator(event_manager_a)
+        self.sim_b = BatchSimulator(event_manager_b)
+        if self.sim_a.max_phase != self.sim_b.max_phase:
+            raise ValueError(f"フェーズ数が違う設定は比べられない: {self.sim_a.max_phase}, {self.sim_b.max_phase}")
+        self.max_phase = self.sim_a.max_phase
+        self.generator = np.random.default_rng(seed)
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.confidence = confidence
+        self.clear = PairedStats()
+        self.deaths = [PairedStats() for _ in range(self.max_phase + 1)]
+
+    def run_block(self, n: int) -> None:
+        """A と B を同じ乱数で n 本ずつ進めて集計に加える"""
+        state_a, state_b = self.sim_a.start(n), self.sim_b.start(n)
+        for phase in range(1, self.max_phase + 1):
+            draws = self.generator.random((DRAWS_PER_PHASE, n))
+            self.sim_a.step(state_a, phase, draws)
+            self.sim_b.step(state_b, phase, draws)
+        _, death_a = self.sim_a.finish(state_a)
+        _, death_b = self.sim_b.finish(state_b)
+        self.clear.add(death_a == 0, death_b == 0)
+        for phase in range(1, self.max_phase + 1):
+            self.deaths[phase].add(death_a == phase, death_b == phase)
+
+    def run(self, precision: float, max_runs: int = 50_000_000,
+            block_runs: int = BLOCK_RUNS) -> Dict[str, object]:
+        """クリア率の差の信頼区間の半幅が precision 以下になるか max_runs に達するまで回す"""
+        while self.clear.n < max_runs:
+            self.run_block(min(block_runs, max_runs - self.clear.n))
+            if self.clear.n >= MIN_RUNS and self.clear.interval("diff", self.z)["half_width"] <= precision:
+                break
+        return self.report(precision)
+
+    def report(self, precision: Optional[float] = None) -> Dict[str, object]:
+        """集計結果（独立に回した場合に同じ精度に必要なラン数の見積もりも付ける）"""
+        z = self.z
+        clear = self.clear
+        var_diff = clear.variance("diff")
+        var_independent = clear.variance("a") + clear.variance("b")
+        return {
+            "runs": clear.n,
+            "confidence": self.confidence,
+            "precision": precision,
+            "converged": precision is not None and clear.interval("diff", z)["half_width"] <= precision,
+            "clear_rate": {"a": clear.interval("a", z), "b": clear.interval("b", z),
+                           "diff": clear.interval("diff", z)},
+            "death_phases": [
+                {"phase": phase, "a": stats.interval("a", z), "b": stats.interval("b", z),
+                 "diff": stats.interval("diff", z)}
+                for phase, stats in enumerate(self.deaths) if phase
+            ],
+            # 独立に回すと差の分散は var_a + var_b。その比がCRNで節約できたラン数の倍率
+            "variance_reduction": var_independent / var_diff if var_diff else float("inf"),
+        }
+
+
+def format_report(report: Dict[str, object]) -> str:
+    """比較結果を表示用の文字列にする"""
+    def ci(item: Dict[str, float], signed: bool = False) -> str:
+        sign = "+" if signed else ""
+        return f"{item['mean']:{sign}.4%} [{item['low']:{sign}.4%}, {item['high']:{sign}.4%}]"
+
+    clear = report["clear_rate"]
+    status = "収束" if report["converged"] else "上限に到達（未収束）"
+    lines = [
+        f"ラン数: {report['runs']}  信頼水準: {report['confidence']:.0%}  {status}",
+        f"クリア率 A: {ci(clear['a'])}",
+        f"クリア率 B: {ci(clear['b'])}",
+        f"差 (B - A): {ci(clear['diff'], True)}",
+        f"分散の削減: {report['variance_reduction']:.1f}倍（独立に回す場合に必要なラン数の比）",
+        "",
+        "フェーズ  死亡率 A            死亡率 B            差 (B - A)",
+    ]
+    for item in report["death_phases"]:
+        lines.append(f"{item['phase']:>6}  {item['a']['mean']:>8.4%}±{item['a']['half_width']:.4%}"
+                     f"  {item['b']['mean']:>8.4%}±{item['b']['half_width']:.4%}"
+                     f"  {item['diff']['mean']:>+8.4%}±{item['diff']['half_width']:.4%}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG 共通乱数法によるA/B比較")
+    parser.add_argument("content_a", nargs="?", default=CONTENT_PATH, help="比較元のコンテンツファイル")
+    parser.add_argument("content_b", help="比較先のコンテンツファイル")
+    parser.add_argument("--precision", type=float, default=0.001,
+                        help="クリア率の差の信頼区間の半幅がこれ以下になったら止める（既定: 0.001 = 0.1ポイント）")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--max-runs", type=int, default=50_000_000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    comparison = CrnComparison(EventManager(load_content(args.content_a)),
+                               EventManager(load_content(args.content_b)),
+                               seed=args.seed, confidence=args.confidence)
+    print(format_report(comparison.run(args.precision, args.max_runs)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""エージェントAPIと方策の評価
+
+プレイヤーの判断は3つだけ: 道の左右（結果に影響しない）、水場で飲むか、宝箱を開けるか。
+Agent はキーボードの代わりにこれを決める。判断を (フェーズ, HP) の表にした Policy は
+厳密に評価でき（policy_value）、NumPy があればバッチ・モンテカルロでまとめて評価できる
+（evaluate_policies）。optimal_policy は (フェーズ, HP) 上の価値反復で最適な方策と
+そのクリア確率を求める。
+
+    python agent.py              # 最適方策と、常に飲む/開ける などの固定方策との比較
+"""
+import argparse
+import sys
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from engine import (
+    MAX_PHASE, MAX_HP, BOSS_DAMAGE, WATER_HEAL_CHANCE,
+    EVENT_PATH, EVENT_BATTLE, EVENT_REST, EVENT_WATER, EVENT_CHEST, ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM,
+    CONTENT_PATH, EventManager, GameEngine, load_content,
+)
+from solver import OutcomeSolver
+
+CHOICE_YES = 0  # 左 / 飲む / 開ける（GameEngine.choice と同じ値）
+CHOICE_NO = 1  # 右 / 飲まない / 開けない
+
+
+class Policy:
+    """(フェーズ, HP) ごとの判断表
+
+    drink[phase][hp] / open_chest[phase][hp] が True なら飲む / 開ける。
+    """
+    __slots__ = ("drink", "open_chest")
+
+    def __init__(self, drink: List[List[bool]], open_chest: List[List[bool]]):
+        self.drink = drink
+        self.open_chest = open_chest
+
+    @classmethod
+    def fixed(cls, drink: bool, open_chest: bool, max_phase: int = MAX_PHASE) -> "Policy":
+        """HPやフェーズによらず同じ判断をする方策"""
+        return cls([[drink] * (MAX_HP + 1) for _ in range(max_phase + 1)],
+                   [[open_chest] * (MAX_HP + 1) for _ in range(max_phase + 1)])
+
+    def decide(self, event_id: int, phase: int, hp: int) -> int:
+        if event_id == EVENT_WATER:
+            return CHOICE_YES if self.drink[phase][hp] else CHOICE_NO
+        if event_id == EVENT_CHEST:
+            return CHOICE_YES if self.open_chest[phase][hp] else CHOICE_NO
+        return CHOICE_YES
+
+    @staticmethod
+    def describe(table: List[List[bool]]) -> str:
+        """判断表を「常に」「しない」「条件付き」のどれかで表す（支配戦略の確認用）"""
+        values = {table[phase][hp] for phase in range(1, len(table) - 1) for hp in range(1, MAX_HP + 1)}
+        if values == {True}:
+            return "常にする"
+        if values == {False}:
+            return "常にしない"
+        return "条件付き"
+
+
+class Agent(ABC):
+    """キーボードの代わりに判断するエージェント（decide を実装しないと作れない）"""
+    @abstractmethod
+    def decide(self, event_id: int, phase: int, hp: int) -> int:
+        """イベント画面での選択（CHOICE_YES / CHOICE_NO）"""
+
+
+class PolicyAgent(Agent):
+    """判断表に従うエージェント"""
+    def __init__(self, policy: Policy):
+        self.policy = policy
+
+    def decide(self, event_id: int, phase: int, hp: int) -> int:
+        return self.policy.decide(event_id, phase, hp)
+
+
+def act(engine: GameEngine, agent: Agent) -> None:
+    """イベント画面でエージェントの判断を ←/→ で選んで決定する（キー入力なので記録・再生できる）"""
+    choice = agent.decide(engine.current_event, engine.phase, engine.player.hp)
+    engine.press(ACTION_LEFT if choice == CHOICE_YES else ACTION_RIGHT)
+    engine.press(ACTION_CONFIRM)
+
+
+def play(engine: GameEngine, agent: Agent) -> Tuple[bool, int, int]:
+    """エージェントで1ランを最後まで進め、(クリアしたか, 終了フェーズ, 終了時HP) を返す"""
+    if engine.is_finished():
+        engine.press(ACTION_CONFIRM)  # タイトルに戻る
+    engine.press(ACTION_CONFIRM)
+    while not engine.is_finished():
+        if engine.state == engine.STATE_EVENT:
+            act(engine, agent)
+        elif engine.state == engine.STATE_TEXT:
+            engine.advance()
+        else:
+            engine.press(ACTION_CONFIRM)
+    return engine.state == engine.STATE_ENDING, engine.phase, max(engine.player.hp, 0)
+
+
+def _event_probs(solver: OutcomeSolver, phase: int) -> Dict[int, object]:
+    weights = [solver.number(w) for w in solver.event_manager.event_weights(phase)]
+    total = sum(weights)
+    return {event_id: w / total for event_id, w in zip(range(1, 6), weights)}
+
+
+def _battle_values(solver: OutcomeSolver, phase: int, next_value: List[object]) -> List[object]:
+    """そのフェーズで戦闘になったときの、HPごとの価値（敵は候補から等確率）"""
+    em = solver.event_manager
+    zero = solver.number(0)
+    if phase == em.max_phase:
+        kernels = [solver.battle_kernel(em.boss_target(), BOSS_DAMAGE)]
+    else:
+        candidates = em.enemy_candidates(phase)
+        if not candidates:
+            return [zero] * (MAX_HP + 1)
+        kernels = [solver.battle_kernel(target, 1) for _, target in candidates]
+    values = [zero] * (MAX_HP + 1)
+    for kernel in kernels:
+        for h in range(1, MAX_HP + 1):
+            values[h] += sum((kernel[h][h2] * next_value[h2] for h2 in range(MAX_HP + 1)), zero) / len(kernels)
+    return values
+
+
+def _backup(solver: OutcomeSolver, policy: Optional[Policy]) -> Tuple[object, Policy]:
+    """フェーズを後ろから解く（policy=None なら各 (フェーズ, HP) で良い方を選ぶ）
+
+    戻り値は (クリア確率, 使った判断表)。
+    """
+    max_phase = solver.event_manager.max_phase
+    number = solver.number
+    zero, one = number(0), number(1)
+    heal = number(WATER_HEAL_CHANCE)
+    third = one / 3
+    chosen = Policy.fixed(False, False, max_phase)
+    value = [zero] + [one] * MAX_HP  # 最終フェーズを越えた時点の価値（生きていればクリア）
+
+    for phase in range(max_phase, 0, -1):
+        battle = _battle_values(solver, phase, value)
+        if phase == max_phase:
+            value = battle
+            continue
+        probs = _event_probs(solver, phase)
+        new_value = [zero] * (MAX_HP + 1)
+        for h in range(1, MAX_HP + 1):
+            stay = value[h]
+            drink_value = heal * value[min(h + 1, MAX_HP)] + (1 - heal) * value[h - 1]
+            open_value = third * (value[h] + value[min(h + 1, MAX_HP)] + battle[h])
+            if policy is None:
+                chosen.drink[phase][h] = drink_value > stay
+                chosen.open_chest[phase][h] = open_value > stay
+            else:
+                chosen.drink[phase][h] = policy.drink[phase][h]
+                chosen.open_chest[phase][h] = policy.open_chest[phase][h]
+            new_value[h] = (
+                (probs[EVENT_PATH] + probs[EVENT_REST]) * stay
+                + probs[EVENT_BATTLE] * battle[h]
+                + probs[EVENT_WATER] * (drink_value if chosen.drink[phase][h] else stay)
+                + probs[EVENT_CHEST] * (open_value if chosen.open_chest[phase][h] else stay)
+            )
+        value = new_value
+    return value[MAX_HP], chosen
+
+
+def optimal_policy(event_manager: Optional[EventManager] = None, exact: bool = True) -> Tuple[Policy, object]:
+    """(フェーズ, HP) 上の価値反復で最適方策とそのクリア確率を求める
+
+    フェーズは前にしか進まないので、最終フェーズから1回さかのぼれば収束する。
+    同点のときは「しない」を選ぶ。長いキャンペーンでは exact=False で使う。
+    """
+    value, policy = _backup(OutcomeSolver(event_manager, exact=exact), None)
+    return policy, value
+
+
+def policy_value(policy: Policy, event_manager: Optional[EventManager] = None, exact: bool = True) -> object:
+    """方策の厳密なクリア確率"""
+    return _backup(OutcomeSolver(event_manager, exact=exact), policy)[0]
+
+
+def evaluate_policies(policies: Dict[str, Policy], runs: int, seed: int = 0,
+                      event_manager: Optional[EventManager] = None) -> Dict[str, Dict[str, object]]:
+    """方策ごとに runs 本のランをバッチ・モンテカルロで評価する（要NumPy）
+
+    すべての方策で同じシードを使うので、方策の差が乱数の差に埋もれにくい。
+    """
+    from batchsim import BatchSimulator
+    em = event_manager or EventManager()
+    return {name: BatchSimulator(em, seed=seed, policy=policy).run(runs) for name, policy in policies.items()}
+
+
+FIXED_POLICIES = {
+    "飲む・開ける": Policy.fixed(True, True),
+    "飲む・開けない": Policy.fixed(True, False),
+    "飲まない・開ける": Policy.fixed(False, True),
+    "飲まない・開けない": Policy.fixed(False, False),
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG 方策の評価")
+    parser.add_argument("--content", default=CONTENT_PATH, help="コンテンツファイル")
+    parser.add_argument("--runs", type=int, default=0, help="バッチ・モンテカルロでも評価するラン数（要NumPy）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    em = EventManager(load_content(args.content))
+    policy, value = optimal_policy(em)
+    print(f"最適方策のクリア確率: {float(value):.6%}")
+    print(f"  水場で飲む: {policy.describe(policy.drink)}  宝箱を開ける: {policy.describe(policy.open_chest)}")
+    print("  フェーズ  " + "  ".join(f"HP{hp}" for hp in range(1, MAX_HP + 1)) + "  (飲む/開ける)")
+    for phase in range(1, em.max_phase):
+        cells = [("飲" if policy.drink[phase][hp] else "-") + ("開" if policy.open_chest[phase][hp] else "-")
+                 for hp in range(1, MAX_HP + 1)]
+        print(f"  {phase:>6}    " + "   ".join(cells))
+
+    print("固定方策のクリア確率:")
+    for name, fixed in FIXED_POLICIES.items():
+        fixed_value = policy_value(fixed, em)
+        print(f"  {name:<10} {float(fixed_value):.6%}  (最適との差 {float(value - fixed_value):+.6%})")
+
+    if args.runs:
+        policies = dict(FIXED_POLICIES, 最適=policy)
+        for name, stats in evaluate_policies(policies, args.runs, args.seed, em).items():
+            print(f"  {name:<10} モンテカルロ {stats['clear_rate']:.4%} ({stats['runs']}ラン)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
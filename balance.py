@@ -0,0 +1,287 @@
+"""バランス自動調整
+
+敵の目標値とイベントの序盤/終盤の重みを探索して、デザイン上の目標
+（例: 全体のクリア率35%、フェーズ5より前の死亡は死亡全体の20%以下）に近づける。
+候補の評価は厳密解ソルバー（浮動小数モード）で行うのでサンプリング誤差がなく、
+1候補あたり1ミリ秒程度で済む。評価済みの設定はキャッシュし、近傍の候補は
+プロセスプールで並列に評価する。
+
+    python balance.py --clear-rate 0.35 --max-early-deaths 0.2 --output tuned.json
+    python balance.py --campaign 2000 --clear-rate 0.05 --early-phase 100   # 長いキャンペーン
+
+長いキャンペーン（campaign.Campaign）では、序盤/終盤の重みは補間の両端、目標値は段階の
+敵の強さとして効く。
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from engine import MAX_PHASE, CONTENT_PATH, ContentError, EventManager, load_content
+from solver import OutcomeSolver
+
+TARGET_RANGE = (1, 10)  # 目標値の範囲（d10なので1-10）
+WEIGHT_RANGE = (0, 100)
+WEIGHT_STEP = 5  # 重みを動かす最初の幅（改善しなくなったら1まで半分にする）
+DISTANCE_PENALTY = 1e-9  # 目標を同じだけ満たすなら元の設定に近い方を選ぶ
+
+# 設定: (敵ごとの目標値, イベント1-5の序盤の重み, イベント1-5の終盤の重み)
+Config = Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]
+# 長いキャンペーン: (フェーズ数, 生成シード)
+CampaignSpec = Tuple[int, int]
+
+_worker_content: Optional[Dict[str, list]] = None
+_worker_campaign: Optional[CampaignSpec] = None
+
+
+def config_from_content(content: Dict[str, list]) -> Config:
+    """コンテンツから設定を取り出す"""
+    events = sorted(content["events"], key=lambda item: item["id"])
+    return (
+        tuple(item["target"] for item in content["enemies"]),
+        tuple(item["weights"][0] for item in events),
+        tuple(item["weights"][1] for item in events),
+    )
+
+
+def apply_config(content: Dict[str, list], config: Config) -> Dict[str, list]:
+    """設定を反映したコンテンツ（元のコンテンツは変更しない）"""
+    content = copy.deepcopy(content)
+    targets, early, late = config
+    for item, target in zip(content["enemies"], targets):
+        item["target"] = target
+    for item in content["events"]:
+        item["weights"] = [early[item["id"] - 1], late[item["id"] - 1]]
+    return content
+
+
+def make_event_manager(content: Dict[str, list], campaign: Optional[CampaignSpec] = None) -> EventManager:
+    """コンテンツの EventManager（campaign を指定すれば長いキャンペーン）"""
+    if campaign is None:
+        return EventManager(content)
+    from campaign import Campaign
+    length, seed = campaign
+    return Campaign(length, seed, content)
+
+
+def evaluate(content: Dict[str, list], config: Config, exact: bool = False,
+             campaign: Optional[CampaignSpec] = None) -> Optional[Dict[str, object]]:
+    """設定の厳密な結果（クリア率・死亡フェーズ分布・クリア時HP分布、不正な設定ならNone）"""
+    try:
+        em = make_event_manager(apply_config(content, config), campaign)
+        return OutcomeSolver(em, exact=exact).solve()
+    except ContentError:
+        return None  # キャンペーンでは抽選表を作るとき（解いている途中）に不正が分かる
+
+
+def _init_worker(content: Dict[str, list], campaign: Optional[CampaignSpec]) -> None:
+    global _worker_content, _worker_campaign
+    _worker_content = content
+    _worker_campaign = campaign
+
+
+def _evaluate_worker(config: Config) -> Optional[Dict[str, object]]:
+    """ワーカープロセスで呼ばれる"""
+    return evaluate(_worker_content, config, campaign=_worker_campaign)
+
+
+class BalanceGoals:
+    """デザイン上の目標
+
+    clear_rate は目指すクリア率、max_early_deaths は early_phase より前のフェーズでの
+    死亡が死亡全体に占める割合の上限。どちらも None なら使わない。
+    """
+    def __init__(self, clear_rate: Optional[float] = None, max_early_deaths: Optional[float] = None,
+                 early_phase: int = 5):
+        self.clear_rate = clear_rate
+        self.max_early_deaths = max_early_deaths
+        self.early_phase = early_phase
+
+    def early_death_share(self, result: Dict[str, object]) -> float:
+        """early_phase より前の死亡が死亡全体に占める割合"""
+        deaths = 1 - result["clear_rate"]
+        if deaths <= 0:
+            return 0.0
+        return sum(result["death_phases"][1:self.early_phase]) / deaths
+
+    def loss(self, result: Optional[Dict[str, object]]) -> float:
+        """目標からのずれ（0なら全目標を満たす）"""
+        if result is None:
+            return float("inf")
+        loss = 0.0
+        if self.clear_rate is not None:
+            loss += (result["clear_rate"] - self.clear_rate) ** 2
+        if self.max_early_deaths is not None:
+            loss += max(0.0, self.early_death_share(result) - self.max_early_deaths) ** 2
+        return loss
+
+    def describe(self, result: Dict[str, object]) -> str:
+        return (f"クリア率 {float(result['clear_rate']):.4%}  "
+                f"フェーズ{self.early_phase}より前の死亡 {float(self.early_death_share(result)):.4%}")
+
+
+class BalanceOptimizer:
+    """目標値と重みの局所探索
+
+    現在の設定から1項目だけ動かした近傍をすべて評価し、最も良いものへ移る。
+    改善しなくなったら重みの刻みを半分にし、刻み1でも改善しなければ、
+    最良の設定をランダムに揺らして探索をやり直す（restarts 回まで）。
+    """
+    def __init__(self, goals: BalanceGoals, content: Optional[Dict[str, list]] = None,
+                 jobs: Optional[int] = None, seed: int = 0, campaign: Optional[CampaignSpec] = None):
+        self.goals = goals
+        self.content = content if content is not None else load_content(CONTENT_PATH)
+        self.campaign = campaign
+        self.origin = config_from_content(self.content)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.rng = random.Random(seed)
+        self.cache: Dict[Config, Optional[Dict[str, object]]] = {}
+        self.hits = 0
+
+    def score(self, config: Config) -> float:
+        """目標からのずれ + 元の設定からの距離の小さなペナルティ"""
+        distance = sum(abs(a - b) for group, origin in zip(config, self.origin) for a, b in zip(group, origin))
+        return self.goals.loss(self.cache[config]) + DISTANCE_PENALTY * distance
+
+    def evaluate_many(self, configs: List[Config], pool: Optional[ProcessPoolExecutor] = None) -> None:
+        """未評価の設定をまとめて評価してキャッシュに入れる"""
+        todo = []
+        for config in configs:
+            if config in self.cache:
+                self.hits += 1
+            elif config not in todo:
+                todo.append(config)
+        if not todo:
+            return
+        if pool is None:
+            results = [evaluate(self.content, config, campaign=self.campaign) for config in todo]
+        else:
+            chunksize = max(1, len(todo) // (self.jobs * 4))
+            results = list(pool.map(_evaluate_worker, todo, chunksize=chunksize))
+        self.cache.update(zip(todo, results))
+
+    def neighbors(self, config: Config, step: int) -> List[Config]:
+        """1項目だけ動かした設定"""
+        result = []
+        targets, early, late = config
+        for i in range(len(targets)):
+            for delta in (-1, 1):
+                value = targets[i] + delta
+                if TARGET_RANGE[0] <= value <= TARGET_RANGE[1]:
+                    result.append((targets[:i] + (value,) + targets[i + 1:], early, late))
+        for group in (1, 2):
+            weights = config[group]
+            for i in range(len(weights)):
+                for delta in (-step, step):
+                    value = weights[i] + delta
+                    if WEIGHT_RANGE[0] <= value <= WEIGHT_RANGE[1]:
+                        changed = list(config)
+                        changed[group] = weights[:i] + (value,) + weights[i + 1:]
+                        result.append(tuple(changed))
+        return result
+
+    def perturb(self, config: Config, size: int = 4) -> Config:
+        """size 項目をランダムに大きく動かす"""
+        groups = [list(group) for group in config]
+        for _ in range(size):
+            group = self.rng.randrange(3)
+            i = self.rng.randrange(len(groups[group]))
+            if group == 0:
+                groups[0][i] = min(max(groups[0][i] + self.rng.choice((-2, -1, 1, 2)), TARGET_RANGE[0]),
+                                   TARGET_RANGE[1])
+            else:
+                groups[group][i] = min(max(groups[group][i] + self.rng.choice((-10, -5, 5, 10)), WEIGHT_RANGE[0]),
+                                       WEIGHT_RANGE[1])
+        return tuple(tuple(group) for group in groups)
+
+    def optimize(self, max_evals: int = 5000, restarts: int = 5,
+                 tolerance: float = 1e-8) -> Tuple[Config, Dict[str, object]]:
+        """最良の設定とその結果を返す（目標のずれが tolerance 以下になったら打ち切る）"""
+        pool = ProcessPoolExecutor(self.jobs, initializer=_init_worker,
+                                   initargs=(self.content, self.campaign)) \
+            if self.jobs > 1 else None
+        try:
+            self.evaluate_many([self.origin], pool)
+            best = current = self.origin
+            for attempt in range(restarts + 1):
+                step = WEIGHT_STEP
+                while len(self.cache) < max_evals:
+                    candidates = self.neighbors(current, step)
+                    self.evaluate_many(candidates, pool)
+                    candidate = min(candidates, key=self.score)
+                    if self.score(candidate) < self.score(current):
+                        current = candidate
+                    elif step > 1:
+                        step //= 2
+                    else:
+                        break
+                if self.score(current) < self.score(best):
+                    best = current
+                if self.goals.loss(self.cache[best]) <= tolerance or len(self.cache) >= max_evals:
+                    break
+                if attempt < restarts:
+                    current = self.perturb(best)
+                    self.evaluate_many([current], pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return best, self.cache[best]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG バランス自動調整")
+    parser.add_argument("--content", default=CONTENT_PATH, help="元のコンテンツファイル")
+    parser.add_argument("--clear-rate", type=float, help="目標のクリア率（例: 0.35）")
+    parser.add_argument("--max-early-deaths", type=float,
+                        help="--early-phase より前の死亡が死亡全体に占める割合の上限（例: 0.2）")
+    parser.add_argument("--early-phase", type=int, default=5)
+    parser.add_argument("--jobs", type=int, help="並列プロセス数（省略時はCPU数）")
+    parser.add_argument("--max-evals", type=int, default=5000, help="評価する設定数の上限")
+    parser.add_argument("--restarts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0, help="やり直し時の揺らし方のシード")
+    parser.add_argument("--output", metavar="PATH", help="調整後のコンテンツをJSONで保存する")
+    parser.add_argument("--campaign", metavar="LENGTH", type=int, help="長いキャンペーン（フェーズ数）で評価する")
+    parser.add_argument("--campaign-seed", type=int, default=0, help="キャンペーンの生成シード")
+    args = parser.parse_args()
+    if args.clear_rate is None and args.max_early_deaths is None:
+        parser.error("--clear-rate か --max-early-deaths を指定してください")
+    campaign = (args.campaign, args.campaign_seed) if args.campaign else None
+    max_phase = args.campaign or MAX_PHASE
+    if not 2 <= args.early_phase <= max_phase:
+        parser.error(f"--early-phase は2-{max_phase}")
+
+    content = load_content(args.content)
+    try:  # 元の内容が不正なら探索しない（evaluate は理由を捨てて None を返すので、ここで理由を出す）
+        origin = OutcomeSolver(make_event_manager(content, campaign), exact=False).solve()
+    except ContentError as e:
+        print(f"元のコンテンツが不正: {e}", file=sys.stderr)
+        return 1
+
+    goals = BalanceGoals(args.clear_rate, args.max_early_deaths, args.early_phase)
+    optimizer = BalanceOptimizer(goals, content, jobs=args.jobs, seed=args.seed, campaign=campaign)
+    print("調整前: " + goals.describe(origin))
+    best, result = optimizer.optimize(args.max_evals, args.restarts)
+    print("調整後: " + goals.describe(result))
+    print(f"評価した設定: {len(optimizer.cache)}  キャッシュヒット: {optimizer.hits}")
+
+    tuned = apply_config(optimizer.content, best)
+    for item in tuned["enemies"]:
+        print(f"  {item['name']}: 目標値 {item['target']}")
+    for item in tuned["events"]:
+        print(f"  {item['type']}: 重み {item['weights'][0]} / {item['weights'][1]}")
+    if campaign is None:
+        exact = evaluate(optimizer.content, best, exact=True)
+        print(f"厳密なクリア確率: {exact['clear_rate']} ({float(exact['clear_rate']):.6%})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(tuned, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
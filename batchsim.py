@@ -0,0 +1,176 @@
+"""NumPyによるバッチ・モンテカルロ
+
+N本のランを配列としてまとめて進める。HP・生死・イベント・敵の目標値を
+それぞれ配列で持ち、1ステップで全ランを1フェーズずつ進める。
+ルールは `engine.GameEngine` / `engine.Simulator` と同じ。
+フェーズの抽選表はそのフェーズを進めるときに取り出すので、長いキャンペーン
+（campaign.Campaign）でも表はフェーズごとに1回ずつ作られるだけで済む。
+"""
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from engine import (
+    MAX_HP, BOSS_DAMAGE, HEAL_CHANCE, WATER_HEAL_CHANCE,
+    EVENT_BATTLE, EVENT_WATER, EVENT_CHEST, EventManager,
+)
+
+# 1フェーズで使う一様乱数の用途（draws の行）
+DRAW_EVENT = 0
+DRAW_WATER = 1
+DRAW_CHEST = 2
+DRAW_ENEMY = 3
+DRAW_HEAL = 4
+DRAW_DICE = 5  # ここから MAX_HP+1 行がダイス
+DRAWS_PER_PHASE = DRAW_DICE + MAX_HP + 1
+
+
+class BatchSimulator:
+    """バッチシミュレーター"""
+    def __init__(self, event_manager: Optional[EventManager] = None,
+                 seed: Optional[int] = None,
+                 drink: bool = True, open_chest: bool = True, policy=None):
+        self.event_manager = event_manager or EventManager()
+        self.generator = np.random.default_rng(seed)
+        self.drink = drink
+        self.open_chest = open_chest
+        # policy（agent.Policy）を渡すと、飲む/開けるを (フェーズ, HP) ごとに決める
+        self.policy = policy
+        self.compile()
+
+    def compile(self) -> None:
+        """EventManager のテーブルを取り込む（テーブル変更後に再度呼ぶ）"""
+        em = self.event_manager
+        em.compile()
+        self.max_phase = em.max_phase
+        self._boss_target = em.boss_target()
+        if self.policy is None:
+            # どのフェーズでも同じ判断なので1行だけ持つ（長いキャンペーンでもフェーズ数に比例しない）
+            shape = (1, MAX_HP + 1)
+            self._drink = np.full(shape, self.drink, dtype=bool)
+            self._open = np.full(shape, self.open_chest, dtype=bool)
+        else:
+            shape = (self.max_phase + 1, MAX_HP + 1)
+            self._drink = np.array(self.policy.drink, dtype=bool).reshape(shape)
+            self._open = np.array(self.policy.open_chest, dtype=bool).reshape(shape)
+
+    def phase_tables(self, phase: int):
+        """フェーズのイベントの累積確率と敵の目標値の配列"""
+        em = self.event_manager
+        cum_weights, total = em.event_tables[phase]
+        targets = [target for _, target, _ in em.enemy_tables[phase]]
+        return np.array(cum_weights, dtype=np.float64) / total, np.array(targets, dtype=np.int8)
+
+    def run(self, n: int, chunk_size: int = 1_000_000) -> Dict[str, object]:
+        """n回のランを実行して集計する（メモリ節約のため chunk_size 本ずつ処理）"""
+        wins = 0
+        death_phases = np.zeros(self.max_phase + 1, dtype=np.int64)
+        end_hp = np.zeros(MAX_HP + 1, dtype=np.int64)
+        done = 0
+        while done < n:
+            size = min(chunk_size, n - done)
+            hp, death_phase = self.run_chunk(size)
+            cleared = death_phase == 0
+            wins += int(cleared.sum())
+            death_phases += np.bincount(death_phase, minlength=self.max_phase + 1)
+            end_hp += np.bincount(hp[cleared], minlength=MAX_HP + 1)
+            done += size
+        death_phases[0] = 0  # 0 はクリアしたランの印
+        return {
+            "runs": n,
+            "wins": wins,
+            "clear_rate": wins / n if n else 0.0,
+            "death_phases": death_phases.tolist(),
+            "end_hp": end_hp.tolist(),
+        }
+
+    def run_chunk(self, n: int):
+        """n本のランを最後まで進め、(終了時HP, 死亡フェーズ) の配列を返す
+
+        死亡フェーズはクリアしたランでは0。
+        """
+        state = self.start(n)
+        for phase in range(1, self.max_phase + 1):
+            self.step(state, phase, self.generator.random((DRAWS_PER_PHASE, n)))
+            if not state[2].any():
+                break  # 全員倒れたら残りのフェーズは進めない
+        return self.finish(state)
+
+    def start(self, n: int) -> List[np.ndarray]:
+        """n本のランの初期状態 [HP, 死亡フェーズ, 生存]"""
+        return [np.full(n, MAX_HP, dtype=np.int8), np.zeros(n, dtype=np.int32), np.ones(n, dtype=bool)]
+
+    def step(self, state: List[np.ndarray], phase: int, draws: np.ndarray) -> None:
+        """全ランを1フェーズ進める
+
+        draws は (DRAWS_PER_PHASE, n) の一様乱数。乱数の使い道が (フェーズ, 用途) ごとに
+        固定なので、同じ draws を別の設定に渡すと共通乱数法（CRN）で比べられる。
+        """
+        hp, death_phase, alive = state
+        n = len(hp)
+        if phase == self.max_phase:
+            battle = alive.copy()
+            target = np.full(n, self._boss_target, dtype=np.int8)
+            damage = BOSS_DAMAGE
+        else:
+            cum_weights, targets = self.phase_tables(phase)
+            event = np.searchsorted(cum_weights, draws[DRAW_EVENT], side="right") + 1
+            event[~alive] = 0
+
+            # 水場: 飲むと50%で回復、50%で1ダメージ
+            hp_index = np.clip(hp, 0, MAX_HP)
+            row = 0 if self.policy is None else phase
+            if self._drink[row].any():
+                water = (event == EVENT_WATER) & self._drink[row][hp_index]
+                healed = draws[DRAW_WATER] < WATER_HEAL_CHANCE
+                hp += water & healed
+                hp -= water & ~healed
+                np.minimum(hp, MAX_HP, out=hp)
+                dead = water & (hp <= 0)
+                death_phase[dead] = phase
+                alive &= ~dead
+
+            # 宝箱: 空 / 回復 / 罠（戦闘）が1/3ずつ
+            battle = event == EVENT_BATTLE
+            if self._open[row].any():
+                chest = (event == EVENT_CHEST) & self._open[row][hp_index]
+                result = (draws[DRAW_CHEST] * 3).astype(np.int8)
+                hp += chest & (result == 1)
+                np.minimum(hp, MAX_HP, out=hp)
+                battle |= chest & (result == 2)
+
+            target = targets[(draws[DRAW_ENEMY] * len(targets)).astype(np.intp)]
+            damage = 1
+
+        # 戦闘: 勝つか倒れるまで同じ敵とダイスを振り続ける（HPは最大 MAX_HP なので MAX_HP+1 回で決着）
+        fighting = battle
+        for roll in range(MAX_HP + 1):
+            if not fighting.any():
+                break
+            lose = fighting & ((draws[DRAW_DICE + roll] * 10).astype(np.int8) + 1 > target)
+            hp -= lose * np.int8(damage)
+            dead = lose & (hp <= 0)
+            death_phase[dead] = phase
+            alive &= ~dead
+            fighting = lose & ~dead
+
+        # 勝利後、20%の確率で1回復
+        hp += battle & alive & (draws[DRAW_HEAL] < HEAL_CHANCE)
+        np.minimum(hp, MAX_HP, out=hp)
+
+    @staticmethod
+    def finish(state: List[np.ndarray]):
+        """(終了時HP, 死亡フェーズ) を返す"""
+        hp, death_phase, _ = state
+        np.maximum(hp, 0, out=hp)
+        return hp, death_phase
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    stats = BatchSimulator(seed=int(sys.argv[2]) if len(sys.argv) > 2 else None).run(runs)
+    print(f"ラン数: {stats['runs']}  クリア率: {stats['clear_rate']:.4%}")
+    for phase in range(1, len(stats["death_phases"])):
+        print(f"フェーズ{phase:2d}で死亡: {stats['death_phases'][phase]}")
+    print(f"クリア時HP分布: {stats['end_hp'][1:]}")
@@ -0,0 +1,239 @@
+"""ベンチマーク
+
+SDLのダミービデオドライバで画面を開かずに、次の値を計測する。
+- Game.STATE_* の各画面について1フレームあたりの update + draw 時間
+- font.render の時間
+- EventManager.get_event / get_enemy の毎秒呼び出し回数
+- ラン全体のシミュレーション速度（GameEngine / Simulator / BatchSimulator）
+
+結果はJSONで保存でき、ベースラインのJSONと比べて悪化した項目があれば終了コード1を返す。
+
+    python bench.py --output bench.json
+    python bench.py --baseline bench.json
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict
+
+import pygame
+
+from campaign import Campaign, MAX_CAMPAIGN_PHASES
+from engine import ACTION_CONFIRM, EventManager, GameEngine, Simulator
+from miniRPG import Game, BLACK, WHITE, MESSAGE_WIDTH
+from render import prepare_state
+from textlayout import break_lines
+
+DEFAULT_THRESHOLD = 0.2  # ベースラインより20%以上悪化したら回帰とみなす
+
+# 計測結果: 名前 -> {"value": 値, "unit": 単位, "higher_is_better": 大きいほど良いか}
+Results = Dict[str, Dict[str, object]]
+
+
+def _rate(func: Callable[[], None], min_time: float = 0.2) -> float:
+    """func を min_time 秒以上繰り返し、毎秒の呼び出し回数を返す"""
+    count = 0
+    batch = 1
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        count += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+        batch *= 2
+
+
+def bench_frames(game: Game, frames: int = 300) -> Results:
+    """各画面の1フレームあたりの update + draw 時間（マイクロ秒、中央値）"""
+    results = {}
+    states = {name: value for name, value in vars(Game).items() if name.startswith("STATE_")}
+    for name, state in sorted(states.items(), key=lambda item: item[1]):
+        prepare_state(game, state)
+        samples = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            game.message_timer = 0  # テキスト画面が自動で送られないようにする
+            game.update()
+            game.screen.fill(BLACK)
+            game.draw()
+            samples.append((time.perf_counter() - start) * 1e6)
+        results[f"frame.{name.lower()}"] = {
+            "value": statistics.median(samples), "unit": "us/frame", "higher_is_better": False,
+        }
+    return results
+
+
+def bench_font(game: Game) -> Results:
+    """font.render 1回と、長いメッセージのレイアウト1回の時間（マイクロ秒）"""
+    text = "壁から水が流れている。飲む？"
+    rate = _rate(lambda: game.font_medium.render(text, True, WHITE))
+    cache = game.text_cache
+    cached_rate = _rate(lambda: cache.render(game.font_medium, text, WHITE))
+    long_text = text * 8
+    layout_rate = _rate(lambda: break_lines(long_text, lambda s: game.font_medium.size(s)[0], MESSAGE_WIDTH))
+    return {
+        "font.render": {"value": 1e6 / rate, "unit": "us/call", "higher_is_better": False},
+        "font.render_cached": {"value": 1e6 / cached_rate, "unit": "us/call", "higher_is_better": False},
+        "layout.break_lines": {"value": 1e6 / layout_rate, "unit": "us/call", "higher_is_better": False},
+    }
+
+
+def bench_event_manager() -> Results:
+    """get_event / get_enemy の毎秒呼び出し回数"""
+    em = EventManager()
+    rng = random.Random(0)
+    phases = list(range(1, 10)) * 10
+    it = iter(())
+
+    def next_phase():
+        nonlocal it
+        try:
+            return next(it)
+        except StopIteration:
+            it = iter(phases)
+            return next(it)
+
+    return {
+        "event_manager.get_event": {
+            "value": _rate(lambda: em.get_event(next_phase(), rng)), "unit": "calls/s", "higher_is_better": True,
+        },
+        "event_manager.get_enemy": {
+            "value": _rate(lambda: em.get_enemy(next_phase(), rng)), "unit": "calls/s", "higher_is_better": True,
+        },
+    }
+
+
+def bench_campaign() -> Results:
+    """長いキャンペーンで、フェーズの抽選表を新しく作る1回の時間（マイクロ秒）
+
+    表はフェーズごとに遅延生成されるので、キャンペーンの長さによらず一定であること。
+    """
+    campaign = Campaign(MAX_CAMPAIGN_PHASES, seed=0)
+    phases = iter(range(1, MAX_CAMPAIGN_PHASES))
+
+    def next_phase():
+        nonlocal phases
+        phase = next(phases, None)
+        if phase is None:
+            phases = iter(range(1, MAX_CAMPAIGN_PHASES))
+            campaign.compile()  # 生成済みの表を捨てて最初から
+            phase = next(phases)
+        campaign.event_tables[phase]
+        campaign.enemy_tables[phase]
+
+    return {
+        "campaign.phase": {"value": 1e6 / _rate(next_phase), "unit": "us/phase", "higher_is_better": False},
+    }
+
+
+def bench_simulation() -> Results:
+    """ラン全体のシミュレーション速度（ラン/秒）"""
+    engine = GameEngine(seed=0)
+
+    def engine_run():
+        engine.press(ACTION_CONFIRM)
+        while not engine.is_finished():
+            if engine.state == engine.STATE_TEXT:
+                engine.next_after_text()
+            else:
+                engine.press(ACTION_CONFIRM)
+        engine.press(ACTION_CONFIRM)  # タイトルに戻る
+
+    simulator = Simulator(seed=0)
+    results = {
+        "simulation.engine": {"value": _rate(engine_run), "unit": "runs/s", "higher_is_better": True},
+        "simulation.simulator": {"value": _rate(simulator.play), "unit": "runs/s", "higher_is_better": True},
+    }
+
+    try:
+        from batchsim import BatchSimulator
+    except ImportError:  # NumPyがない環境では省略
+        return results
+    batch = BatchSimulator(seed=0)
+    runs = 200_000
+    rate = _rate(lambda: batch.run_chunk(runs), min_time=0.5) * runs
+    results["simulation.batch"] = {"value": rate, "unit": "runs/s", "higher_is_better": True}
+    return results
+
+
+def run_all() -> Dict[str, object]:
+    """全ベンチマークを実行する"""
+    game = Game()
+    results: Results = {}
+    results.update(bench_frames(game))
+    results.update(bench_font(game))
+    results.update(bench_event_manager())
+    results.update(bench_campaign())
+    results.update(bench_simulation())
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object],
+            threshold: float = DEFAULT_THRESHOLD) -> Dict[str, Dict[str, object]]:
+    """ベースラインと比較し、項目ごとの変化率と回帰かどうかを返す
+
+    change は良くなった方向が正（+0.1 なら10%改善）。
+    """
+    report = {}
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["value"]:
+            continue
+        ratio = result["value"] / base["value"]
+        change = ratio - 1 if result["higher_is_better"] else 1 / ratio - 1
+        report[name] = {"baseline": base["value"], "current": result["value"],
+                        "change": change, "regression": change < -threshold}
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG ベンチマーク")
+    parser.add_argument("--output", metavar="PATH", help="結果をJSONで保存する")
+    parser.add_argument("--baseline", metavar="PATH", help="比較するベースラインのJSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="回帰とみなす悪化率（既定: 0.2 = 20%%）")
+    args = parser.parse_args()
+
+    current = run_all()
+    pygame.quit()
+    for name, result in current["results"].items():
+        print(f"{name:32s} {result['value']:>14.2f} {result['unit']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    report = compare(current, baseline, args.threshold)
+    regressions = [name for name, item in report.items() if item["regression"]]
+    print()
+    for name, item in report.items():
+        mark = "  << 回帰" if item["regression"] else ""
+        print(f"{name:32s} {item['change']:+8.1%}{mark}")
+    print(f"\n{len(report)}項目中 {len(regressions)}項目が回帰")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
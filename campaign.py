@@ -0,0 +1,197 @@
+"""長いキャンペーン（フェーズ数を指定し、各フェーズの内容をシードから遅延生成する）
+
+Campaign は EventManager と同じように GameEngine・Simulator・BatchSimulator・
+OutcomeSolver に渡せる。イベントの重みと登場する敵の範囲はフェーズの関数で与え
+（既定は序盤の重みから終盤の重みへの線形補間と、弱い敵から強い敵へずれていく窓。
+既定の重みは約90フェーズまで危険なイベントの回数を通常のランと同じくらいに保つが、
+それより長いと危険なイベントが増えてクリア率が下がり、1000フェーズ以上はまずクリアできない）、
+各フェーズの抽選表はプレイヤーがそのフェーズに初めて着いたときに (シード, フェーズ) から
+作り、Campaign が生きているあいだ持ち続ける。表を作るのは各フェーズで1回だけなので、
+何ランしても2回目以降のランのフェーズの処理は通常の EventManager と同じ辞書の参照になる
+（メモリは着いたことのあるフェーズ数に比例し、1フェーズあたり数百バイト）。
+
+    python campaign.py 5000 --seed 1 --runs 1000
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from engine import (
+    MAX_PHASE, MASK64, GOLDEN_GAMMA, BOSS_NAME, EVENT_PATH, EVENT_BATTLE, EVENT_REST, EVENT_CHEST,
+    CONTENT_PATH, ContentError, CounterRandom, EventManager, Simulator, load_content, mix64,
+)
+
+MAX_CAMPAIGN_PHASES = 65535  # テレメトリとスナップショットのフェーズ欄（16ビット）に入る長さ
+WEIGHT_JITTER = 0.25  # フェーズごとにイベントの重みを揺らす幅（±25%）
+MIN_DANGER_SCALE = 0.1  # 危険なイベントの確率を薄める下限（これより薄めるとほぼ何も起こらないフェーズが続く）
+
+# (フェーズ, 長さ, 序盤の重み, 終盤の重み) -> イベント1-5の重み
+EventWeights = Callable[[int, int, Sequence[float], Sequence[float]], Sequence[float]]
+# (フェーズ, 長さ, 敵の段階数) -> 登場しうる段階の範囲 (最小, 最大)。段階0が最も弱い
+EnemyRange = Callable[[int, int, int], Tuple[int, int]]
+
+
+def _progress(phase: int, length: int) -> float:
+    """ボス戦を除いたフェーズの進み具合（最初のフェーズで0、ボス戦の直前で1）"""
+    return (phase - 1) / max(length - 2, 1)
+
+
+def interpolated_weights(phase: int, length: int, early: Sequence[float], late: Sequence[float]) -> List[float]:
+    """序盤の重みから終盤の重みへ線形に移る（既定のイベントの重み）
+
+    HPは増えないので、フェーズが増えたぶん危険なイベントも増えるとまず生き残れない。
+    戦闘・水場・宝箱の確率は (MAX_PHASE - 1) / (length - 1) 倍にして、ラン全体で起こる
+    回数を通常の10フェーズのランと同じくらいに保つ（減らしたぶんは道と休憩に回す）。
+    ただし MIN_DANGER_SCALE 倍より薄めないので、約90フェーズより長いキャンペーンは
+    長いほど危険なイベントが増えてクリア率が下がる（何も起こらないフェーズばかりにはしない）。
+    """
+    t = _progress(phase, length)
+    weights = [a + (b - a) * t for a, b in zip(early, late)]
+    scale = min(max((MAX_PHASE - 1) / (length - 1), MIN_DANGER_SCALE), 1.0)
+    neutral = weights[EVENT_PATH - 1] + weights[EVENT_REST - 1]
+    danger = sum(weights) - neutral
+    if neutral <= 0 or danger <= 0:
+        return weights  # 道と休憩がなければ回す先がない
+    pad = (neutral + danger * (1 - scale)) / neutral  # 合計の重みを変えない
+    return [w * pad if event_id in (EVENT_PATH, EVENT_REST) else w * scale
+            for event_id, w in zip(range(1, 6), weights)]
+
+
+def sliding_enemy_range(phase: int, length: int, tiers: int) -> Tuple[int, int]:
+    """隣り合う3段階の窓が、弱い敵から強い敵へずれていく（既定の敵の範囲）"""
+    center = round(_progress(phase, length) * (tiers - 1))
+    return max(center - 1, 0), min(center + 1, tiers - 1)
+
+
+class PhaseTables(dict):
+    """フェーズ -> 抽選表 の遅延生成
+
+    まだない表だけ build(phase) で作って持ち続ける。作った表の参照は dict そのものなので、
+    Simulator の内側のループから見ても EventManager の表と同じ速さになる。
+    """
+    def __init__(self, build: Callable[[int], object]):
+        super().__init__()
+        self.build = build
+
+    def __missing__(self, phase: int):
+        table = self[phase] = self.build(phase)
+        return table
+
+
+class Campaign(EventManager):
+    """フェーズ数 length のキャンペーン
+
+    ボス以外の敵を目標値の高い（弱い）順に段階として並べ、フェーズごとに enemy_range の
+    範囲から敵を選ぶ。イベントの重みは event_weights にフェーズごとの揺らぎを掛けたもの。
+    同じ (コンテンツ, length, seed) なら、どの順にフェーズを作っても同じ表になる。
+    """
+    def __init__(self, length: int, seed: int = 0, content: Optional[Dict[str, list]] = None,
+                 event_weights: EventWeights = interpolated_weights,
+                 enemy_range: EnemyRange = sliding_enemy_range,
+                 content_path: str = CONTENT_PATH):
+        if not 2 <= length <= MAX_CAMPAIGN_PHASES:
+            raise ValueError(f"キャンペーンの長さは2-{MAX_CAMPAIGN_PHASES}: {length}")
+        self.max_phase = length
+        self.seed = seed & MASK64
+        self.weight_function = event_weights
+        self.range_function = enemy_range
+        super().__init__(content, content_path)
+
+    def validate(self) -> None:
+        """EventManager の検証に加え、段階に並べる敵がいるか確かめる（敵の登場フェーズは使わない）"""
+        super().validate()
+        if not any(name != BOSS_NAME for name, _, _, _ in self.enemies):
+            raise ContentError("ボス以外の敵がいない")
+
+    def compile(self) -> None:
+        """テーブルを検証し、生成済みの抽選表を捨てる（表はフェーズに着いたときに作り直される）"""
+        self.validate()
+        roster = [(name, target, enemy_id) for enemy_id, (name, target, _, _) in enumerate(self.enemies)
+                  if name != BOSS_NAME]
+        self.tiers = sorted(roster, key=lambda enemy: -enemy[1])
+        self.early = [self.events[i][2] for i in range(1, 6)]
+        self.late = [self.events[i][3] for i in range(1, 6)]
+        self.event_tables = PhaseTables(self._build_event_table)
+        self.enemy_tables = PhaseTables(self._build_enemy_table)
+
+    def phase_random(self, phase: int, stream: int) -> CounterRandom:
+        """フェーズごと・用途ごとに独立した乱数（前のフェーズを作らなくても同じ値になる）"""
+        return CounterRandom(mix64((self.seed + (phase * 2 + stream) * GOLDEN_GAMMA) & MASK64))
+
+    def event_weights(self, phase: int) -> List[float]:
+        """フェーズでのイベント1-5の重み（揺らぎ込み）"""
+        rng = self.phase_random(phase, 0)
+        return [w * (1 - WEIGHT_JITTER + 2 * WEIGHT_JITTER * rng.random())
+                for w in self.weight_function(phase, self.max_phase, self.early, self.late)]
+
+    def event_weight_phases(self, late: bool) -> range:
+        """すべてのフェーズが序盤と終盤の重みを混ぜて使う"""
+        return range(1, self.max_phase)
+
+    def enemy_phases(self, enemy_id: int) -> range:
+        """どの敵がどのフェーズに出るかは生成するまで分からない"""
+        return range(1, self.max_phase + 1)
+
+    def _build_event_table(self, phase: int) -> Tuple[List[float], float]:
+        cum_weights, total = [], 0.0
+        for weight in self.event_weights(phase):
+            if weight < 0:
+                raise ContentError(f"フェーズ{phase}のイベントの重みが負: {weight}")
+            total += weight
+            cum_weights.append(total)
+        if total <= 0:
+            raise ContentError(f"フェーズ{phase}のイベントの重みがすべて0")
+        return cum_weights, total
+
+    def _build_enemy_table(self, phase: int) -> Tuple[Tuple[str, int, int], ...]:
+        """範囲内の段階をそれぞれ1/2で選ぶ（1体も選ばれなければ1体だけ選ぶ）"""
+        low, high = self.range_function(phase, self.max_phase, len(self.tiers))
+        if not 0 <= low <= high < len(self.tiers):
+            raise ContentError(f"フェーズ{phase}の敵の範囲が不正: {low}-{high}")
+        rng = self.phase_random(phase, 1)
+        candidates = tuple(enemy for enemy in self.tiers[low:high + 1] if rng.random() < 0.5)
+        return candidates or (self.tiers[low + int(rng.random() * (high - low + 1))],)
+
+    def describe(self, phase: int) -> str:
+        """フェーズの内容の要約"""
+        if phase == self.max_phase:
+            return f"フェーズ{phase}: {BOSS_NAME}（目標値 {self.boss_target()}）"
+        cum_weights, total = self.event_tables[phase]
+        probs = [(b - a) / total for a, b in zip([0.0] + cum_weights, cum_weights)]
+        battle = probs[EVENT_BATTLE - 1] + probs[EVENT_CHEST - 1] / 3
+        enemies = "・".join(f"{name}({target})" for name, target, _ in self.enemy_tables[phase])
+        return f"フェーズ{phase}: 戦闘 {battle:.2%}  敵 {enemies}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG 長いキャンペーン")
+    parser.add_argument("length", type=int, help="フェーズ数（最終フェーズはボス戦）")
+    parser.add_argument("--seed", type=int, default=0, help="キャンペーンの生成シード")
+    parser.add_argument("--content", default=CONTENT_PATH, help="コンテンツファイル")
+    parser.add_argument("--show", type=int, default=5, help="内容を表示するフェーズ数（等間隔）")
+    parser.add_argument("--runs", type=int, default=0, help="シミュレーションするラン数")
+    parser.add_argument("--sim-seed", type=int, default=0, help="シミュレーションの乱数のシード")
+    args = parser.parse_args()
+
+    campaign = Campaign(args.length, args.seed, load_content(args.content))
+    if args.show:
+        step = max((args.length - 1) // args.show, 1)
+        for phase in list(range(1, args.length, step))[:args.show] + [args.length]:
+            print(campaign.describe(phase))
+
+    if args.runs:
+        simulator = Simulator(campaign, seed=args.sim_seed)
+        start = time.perf_counter()
+        stats = simulator.run(args.runs)
+        elapsed = time.perf_counter() - start
+        phases = sum(phase * count for phase, count in enumerate(stats["death_phases"])) \
+            + args.length * stats["wins"]
+        print(f"ラン数: {stats['runs']}  クリア率: {stats['clear_rate']:.4%}  "
+              f"平均到達フェーズ: {phases / args.runs:.1f}")
+        print(f"{elapsed:.2f}秒（1フェーズあたり {elapsed / phases * 1e6:.2f}マイクロ秒）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Simulator・GameEngine・OutcomeSolver の一致チェック
+
+`engine.Simulator` は `GameEngine` のルールを手で展開した別実装なので、ルールを変えたら
+両方がずれていないかをここで確かめる。
+
+- シードごとに GameEngine をキー入力（水場/宝箱は ←/→ で選んで決定、テキストは自動送り）
+  で最後まで進め、同じシードの Simulator.play() と結果 (クリア, フェーズ, HP) を比べる
+- Simulator のクリア率が OutcomeSolver の厳密なクリア率から統計的にずれていないか比べる
+
+    python consistency.py                   # 不一致があれば終了コード1
+    python consistency.py --campaign 300
+"""
+import argparse
+import math
+import sys
+from typing import List, Optional, Tuple
+
+from engine import (
+    EVENT_WATER, EVENT_CHEST, ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM,
+    CONTENT_PATH, EventManager, GameEngine, Simulator, load_content,
+)
+from solver import OutcomeSolver
+
+MAX_Z = 4.0  # クリア率の差を不一致とみなす標準誤差の倍数（偶然の誤検出は約1/16000）
+
+# ランの結果: (クリアしたか, 終了フェーズ, 終了時HP)
+Result = Tuple[bool, int, int]
+
+
+def play_engine(engine: GameEngine, drink: bool = True, open_chest: bool = True) -> Result:
+    """GameEngine をキー入力だけで1ラン進める（Simulator と同じ判断をする）"""
+    engine.press(ACTION_CONFIRM)
+    while not engine.is_finished():
+        if engine.state == engine.STATE_EVENT:
+            take = {EVENT_WATER: drink, EVENT_CHEST: open_chest}.get(engine.current_event, True)
+            engine.press(ACTION_LEFT if take else ACTION_RIGHT)
+            engine.press(ACTION_CONFIRM)
+        elif engine.state == engine.STATE_TEXT:
+            engine.advance()
+        else:
+            engine.press(ACTION_CONFIRM)
+    return engine.state == engine.STATE_ENDING, engine.phase, max(engine.player.hp, 0)
+
+
+def compare_runs(seeds: range, event_manager: Optional[EventManager] = None,
+                 drink: bool = True, open_chest: bool = True) -> List[Tuple[int, Result, Result]]:
+    """シードごとに GameEngine と Simulator を比べ、結果が違うもの (シード, エンジン, Simulator) を返す"""
+    event_manager = event_manager or EventManager()
+    mismatches = []
+    for seed in seeds:
+        expected = play_engine(GameEngine(event_manager, seed=seed), drink, open_chest)
+        result = Simulator(event_manager, seed=seed, drink=drink, open_chest=open_chest).play()
+        if result != expected:
+            mismatches.append((seed, expected, result))
+    return mismatches
+
+
+def compare_clear_rate(runs: int, seed: int = 0, event_manager: Optional[EventManager] = None,
+                       drink: bool = True, open_chest: bool = True) -> Tuple[float, float, float]:
+    """Simulator のクリア率と OutcomeSolver のクリア率を比べ、(厳密値, 推定値, 差/標準誤差) を返す"""
+    event_manager = event_manager or EventManager()
+    exact = float(OutcomeSolver(event_manager, drink, open_chest,
+                                exact=type(event_manager) is EventManager).solve()["clear_rate"])
+    estimate = Simulator(event_manager, seed=seed, drink=drink, open_chest=open_chest).run(runs)["clear_rate"]
+    error = math.sqrt(max(exact * (1 - exact), 1e-12) / runs)
+    return exact, estimate, (estimate - exact) / error
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Simulator・GameEngine・OutcomeSolver の一致チェック")
+    parser.add_argument("--seeds", type=int, default=2000, help="GameEngine と比べるシードの数")
+    parser.add_argument("--runs", type=int, default=200_000, help="クリア率を比べるラン数")
+    parser.add_argument("--seed", type=int, default=0, help="クリア率を比べるシミュレーションのシード")
+    parser.add_argument("--content", default=CONTENT_PATH, help="コンテンツファイル")
+    parser.add_argument("--campaign", metavar="LENGTH", type=int, help="長いキャンペーンで比べる")
+    parser.add_argument("--campaign-seed", type=int, default=0, help="キャンペーンの生成シード")
+    args = parser.parse_args()
+
+    content = load_content(args.content)
+    if args.campaign:
+        from campaign import Campaign
+        event_manager = Campaign(args.campaign, args.campaign_seed, content)
+    else:
+        event_manager = EventManager(content)
+
+    failed = False
+    for drink, open_chest in ((True, True), (False, False), (True, False), (False, True)):
+        label = f"飲む={'はい' if drink else 'いいえ'} 開ける={'はい' if open_chest else 'いいえ'}"
+        mismatches = compare_runs(range(args.seeds), event_manager, drink, open_chest)
+        exact, estimate, z = compare_clear_rate(args.runs, args.seed, event_manager, drink, open_chest)
+        print(f"{label}: 不一致 {len(mismatches)}/{args.seeds}シード  "
+              f"クリア率 厳密 {exact:.4%} / シミュレーション {estimate:.4%} ({z:+.2f}σ)")
+        for seed, expected, result in mismatches[:5]:
+            print(f"  シード{seed}: GameEngine {expected} / Simulator {result}")
+        if mismatches or abs(z) > MAX_Z:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,720 @@
+"""洞窟探検RPGのルールエンジン（pygame非依存）
+
+画面を持たずにゲームのルール（フェーズ進行・イベント・戦闘・水場/宝箱の結果・HP）
+だけを扱う。`miniRPG.Game` はこのエンジンの上に載る pygame フロントエンド。
+"""
+import json
+import os
+import random
+from bisect import bisect
+from typing import List, Dict, Tuple, Optional
+
+# ゲーム全体の定数
+MAX_PHASE = 10  # 最終フェーズ（必ずボス戦）。長いキャンペーンでは EventManager.max_phase
+MAX_HP = 3
+BOSS_NAME = "洞窟の王"
+BOSS_DAMAGE = 3  # ラスボス戦で敗北したときのダメージ
+HEAL_CHANCE = 0.2  # 戦闘勝利後に回復する確率
+WATER_HEAL_CHANCE = 0.5  # 水を飲んで回復する確率
+MESSAGE_SECONDS = 2  # テキスト画面が自動で送られるまでの秒数
+
+# イベントと敵のテーブル
+CONTENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+
+# イベントID
+EVENT_PATH = 1
+EVENT_BATTLE = 2
+EVENT_REST = 3
+EVENT_WATER = 4
+EVENT_CHEST = 5
+
+# メッセージID（文面は MESSAGES、{enemy} は現在の敵の名前、{damage} はダメージ）
+MSG_NONE = 0
+MSG_LEFT = 1
+MSG_RIGHT = 2
+MSG_REST = 3
+MSG_WATER_GOOD = 4
+MSG_WATER_BAD = 5
+MSG_WATER_SKIP = 6
+MSG_CHEST_EMPTY = 7
+MSG_CHEST_POTION = 8
+MSG_CHEST_TRAP = 9
+MSG_CHEST_SKIP = 10
+MSG_WIN = 11
+MSG_LOSE = 12
+MSG_WIN_HEAL = 13
+MSG_BLOCKED = 14
+MESSAGES = (
+    "",
+    "左に進んだ。",
+    "右に進んだ。",
+    "静かな場所で休憩した。何も起こらない。",
+    "水を飲んだ。体調が良くなった！",
+    "水を飲んだ。お腹が痛い...",
+    "水を飲まなかった。何も起こらない。",
+    "宝箱は空だった...",
+    "回復薬を見つけた！",
+    "罠だった！敵が現れた！",
+    "宝箱をそのままにした。",
+    "勝利した！",
+    "敗北した... HPが{damage}減った！",
+    "戦闘に勝利した！\nHPが回復した！",
+    "{enemy}は道を塞いでいる！",
+)
+
+# 入力アクション（キー入力を抽象化したもの）
+ACTION_LEFT = 0
+ACTION_RIGHT = 1
+ACTION_CONFIRM = 2
+ACTION_ADVANCE = 3  # テキスト画面のタイマーによる自動送り
+
+# テレメトリの記録の種類（GameEngine.telemetry.record(kind, phase, hp, a, b) の kind）
+TELEMETRY_START = 1  # ラン開始
+TELEMETRY_EVENT = 2  # a: イベントID
+TELEMETRY_CHOICE = 3  # a: イベントID, b: 選択（0: 左/はい, 1: 右/いいえ）
+TELEMETRY_BATTLE = 4  # a: 敵ID（不明なら255）, b: 目標値
+TELEMETRY_DICE = 5  # a: 出目, b: 勝ったら1
+TELEMETRY_HP = 6  # a: 変化前のHP, b: 原因のイベントID（hp は変化後。HPが変わったときだけ）
+TELEMETRY_END = 7  # a: クリアなら1
+
+
+class RngStreams:
+    """サブシステムごとの乱数ストリーム
+
+    イベント抽選・敵の抽選・ダイス・水場・宝箱・勝利後の回復がそれぞれ独立した
+    random.Random を持つので、どこかで乱数の消費回数が変わっても他に影響しない。
+    同じシードからは常に同じストリームが作られる。
+    """
+    NAMES = ("event", "enemy", "dice", "water", "chest", "heal")
+
+    def __init__(self, seed: Optional[int] = None, rng: Optional[random.Random] = None):
+        if rng is not None:
+            # 1つの乱数生成器を全サブシステムで共有する（シードは不明）
+            self.seed = None
+            for name in self.NAMES:
+                setattr(self, name, rng)
+            return
+
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+        for name in self.NAMES:
+            setattr(self, name, random.Random(f"{self.seed}:{name}"))
+
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def mix64(z: int) -> int:
+    """SplitMix64 の出力関数"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+class CounterRandom:
+    """カウンター方式の乱数（SplitMix64）
+
+    状態はキーと引いた回数だけなので、数バイトで保存・復元できる。
+    random.Random より遅いので、状態を小さく保ちたいセッション用。
+    """
+    __slots__ = ("key", "counter")
+
+    def __init__(self, key: int, counter: int = 0):
+        self.key = key
+        self.counter = counter
+
+    def random(self) -> float:
+        """[0, 1) の一様乱数"""
+        self.counter += 1
+        return (mix64((self.key + self.counter * GOLDEN_GAMMA) & MASK64) >> 11) * (1.0 / (1 << 53))
+
+
+class CompactStreams(RngStreams):
+    """状態がシードとサブシステムごとの回数だけの乱数ストリーム（snapshot.py で保存できる）"""
+    def __init__(self, seed: Optional[int] = None, counters: Optional[List[int]] = None):
+        self.seed = (seed if seed is not None else random.randrange(2 ** 63)) & MASK64
+        counters = counters or [0] * len(self.NAMES)
+        for i, name in enumerate(self.NAMES):
+            key = mix64((self.seed + (i + 1) * GOLDEN_GAMMA) & MASK64)
+            setattr(self, name, CounterRandom(key, counters[i]))
+
+    def counters(self) -> List[int]:
+        """サブシステムごとの引いた回数"""
+        return [getattr(self, name).counter for name in self.NAMES]
+
+
+class Enemy:
+    """敵クラス"""
+    __slots__ = ("name", "target", "enemy_id")
+
+    def __init__(self, name: str, target: int, enemy_id: Optional[int] = None):
+        self.name = name
+        self.target = target  # ダイスロールの目標値（ロール <= target で勝利）
+        self.enemy_id = enemy_id  # EventManager.enemies でのインデックス
+
+
+class Player:
+    """プレイヤークラス"""
+    __slots__ = ("hp", "max_hp")
+
+    def __init__(self):
+        self.hp = MAX_HP
+        self.max_hp = MAX_HP
+
+    def heal(self, amount: int) -> None:
+        """HPを回復"""
+        self.hp = min(self.hp + amount, self.max_hp)
+
+    def damage(self, amount: int) -> None:
+        """ダメージを受ける"""
+        self.hp = max(self.hp - amount, 0)
+
+    def is_alive(self) -> bool:
+        """生存確認"""
+        return self.hp > 0
+
+
+class ContentError(ValueError):
+    """コンテンツファイルの内容が不正"""
+
+
+def load_content(path: str = CONTENT_PATH) -> Dict[str, list]:
+    """コンテンツファイル（JSON）を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class EventManager:
+    """イベント管理クラス
+
+    イベントと敵のテーブルはコンテンツファイル（既定は content.json）から読み込み、
+    フェーズごとの抽選表にコンパイルしておく。テーブルを書き換えたら compile() を呼ぶ。
+    ランの長さは max_phase（長いキャンペーンは campaign.Campaign）。
+    """
+    max_phase = MAX_PHASE
+
+    def __init__(self, content: Optional[Dict[str, list]] = None, content_path: str = CONTENT_PATH):
+        if content is None:
+            content = load_content(content_path)
+
+        try:
+            # イベントID: (タイプ, 説明, 序盤の重み, 終盤の重み)
+            self.events = {
+                item["id"]: (item["type"], item["description"], item["weights"][0], item["weights"][1])
+                for item in content["events"]
+            }
+            # 敵タイプ: (名前, 目標値, 最小フェーズ, 最大フェーズ)
+            self.enemies = [
+                (item["name"], item["target"], item["phases"][0], item["phases"][1])
+                for item in content["enemies"]
+            ]
+        except (KeyError, IndexError, TypeError) as e:
+            raise ContentError(f"コンテンツの形式が不正: {e!r}") from e
+
+        self.compile()
+
+    def compile(self) -> None:
+        """テーブルを検証し、フェーズごとの抽選表を作る
+
+        event_tables[phase] はイベントの累積重みと合計（random.choices と同じ引き方で
+        二分探索する）、enemy_tables[phase] はそのフェーズに登場する敵の (名前, 目標値, 敵ID)。
+        """
+        self.validate()
+        self.event_tables: Dict[int, Tuple[List[float], float]] = {}
+        self.enemy_tables: Dict[int, Tuple[Tuple[str, int, int], ...]] = {}
+        for phase in range(1, self.max_phase):
+            weights = self.event_weights(phase)
+            cum_weights, total = [], 0
+            for weight in weights:
+                total += weight
+                cum_weights.append(total)
+            if total <= 0:
+                raise ContentError(f"フェーズ{phase}のイベントの重みがすべて0")
+            self.event_tables[phase] = (cum_weights, total + 0.0)
+
+            candidates = tuple((name, target, enemy_id)
+                               for enemy_id, (name, target, min_phase, max_phase) in enumerate(self.enemies)
+                               if min_phase <= phase <= max_phase)
+            # 戦闘か宝箱の罠が起こりうるフェーズには敵が必要
+            can_fight = weights[EVENT_BATTLE - 1] > 0 or weights[EVENT_CHEST - 1] > 0
+            if can_fight and not candidates:
+                raise ContentError(f"フェーズ{phase}に登場する敵がいない")
+            self.enemy_tables[phase] = candidates
+
+    def validate(self) -> None:
+        """イベントと敵のテーブルを検証する（不正なら ContentError）"""
+        if sorted(self.events) != list(range(1, 6)):
+            raise ContentError("イベントIDは1-5がそろっている必要がある")
+        for event_id, (_, _, early, late) in self.events.items():
+            if not all(isinstance(w, (int, float)) and w >= 0 for w in (early, late)):
+                raise ContentError(f"イベント{event_id}の重みが不正: {early}, {late}")
+        for name, target, min_phase, max_phase in self.enemies:
+            if not isinstance(target, int) or not 1 <= target <= 10:
+                raise ContentError(f"{name}の目標値が1-10の整数ではない: {target!r}")  # d10で勝てる値
+            if not isinstance(min_phase, int) or not isinstance(max_phase, int):
+                raise ContentError(f"{name}の登場フェーズが整数ではない: {min_phase!r}-{max_phase!r}")
+            if not 1 <= min_phase <= max_phase <= self.max_phase:
+                raise ContentError(f"{name}の登場フェーズが不正: {min_phase}-{max_phase}")
+        if not any(name == BOSS_NAME for name, _, _, _ in self.enemies):
+            raise ContentError(f"ボス（{BOSS_NAME}）がいない")
+
+    def event_weights(self, phase: int) -> List[float]:
+        """フェーズでのイベント1-5の重み（フェーズ5までは序盤、それ以降は終盤の重み）"""
+        column = 2 if phase <= 5 else 3
+        return [self.events[i][column] for i in range(1, 6)]
+
+    def event_weight_phases(self, late: bool) -> range:
+        """序盤（late=False）/ 終盤の重みを使うフェーズ（ソルバーのキャッシュ破棄用）"""
+        return range(6, self.max_phase) if late else range(1, min(6, self.max_phase))
+
+    def enemy_phases(self, enemy_id: int) -> range:
+        """敵が登場しうるフェーズ（ソルバーのキャッシュ破棄用）"""
+        _, _, min_phase, max_phase = self.enemies[enemy_id]
+        return range(max(min_phase, 1), min(max_phase, self.max_phase) + 1)
+
+    def get_event(self, phase: int, rng: Optional[random.Random] = None) -> int:
+        """フェーズに基づいてランダムイベントを選択"""
+        if phase == self.max_phase:
+            return EVENT_BATTLE  # 最終フェーズは常に戦闘
+
+        cum_weights, total = self.event_tables[phase]
+        return bisect(cum_weights, (rng or random).random() * total, 0, 4) + 1
+
+    def get_enemy(self, phase: int, rng: Optional[random.Random] = None) -> Enemy:
+        """フェーズに基づいて敵を選択"""
+        # 最終フェーズは常にボス
+        if phase == self.max_phase:
+            return Enemy(BOSS_NAME, self.boss_target(), self.boss_id())
+
+        candidates = self.enemy_tables[phase]
+        name, target, enemy_id = candidates[int((rng or random).random() * len(candidates))]
+        return Enemy(name, target, enemy_id)
+
+    def enemy_candidates(self, phase: int) -> List[Tuple[str, int]]:
+        """フェーズに登場しうる敵の (名前, 目標値) 一覧（最終フェーズ以外）"""
+        return [(name, target) for name, target, _ in self.enemy_tables[phase]]
+
+    def boss_target(self) -> int:
+        """ボスの目標値（敵テーブルに無ければ初期値の3）"""
+        for name, target, _, _ in self.enemies:
+            if name == BOSS_NAME:
+                return target
+        return 3
+
+    def boss_id(self) -> Optional[int]:
+        """ボスの敵ID"""
+        for enemy_id, (name, _, _, _) in enumerate(self.enemies):
+            if name == BOSS_NAME:
+                return enemy_id
+        return None
+
+
+def format_message(message: str) -> str:
+    """メッセージの自動改行（「。」で区切って改行する）"""
+    if "。" not in message:
+        return message
+
+    parts = message.split("。")
+    formatted_message = ""
+    for i, part in enumerate(parts):
+        if part:  # 空文字列でない場合
+            if i < len(parts) - 1:  # 最後の要素でなければ「。」を付ける
+                formatted_message += part + "。\n"
+            else:  # 最後の要素で、それが空でなければ追加
+                formatted_message += part
+    return formatted_message.rstrip('\n')  # 末尾の改行を削除
+
+
+def battle_damage(phase: int, enemy: Enemy, max_phase: int = MAX_PHASE) -> int:
+    """戦闘敗北時のダメージ（ラスボスは3ダメージ、それ以外は1ダメージ）"""
+    return BOSS_DAMAGE if phase == max_phase and enemy.name == BOSS_NAME else 1
+
+
+def roll_d10(rng: random.Random) -> int:
+    """10面サイコロ（1-10）"""
+    return int(rng.random() * 10) + 1
+
+
+class GameEngine:
+    """ゲーム進行（状態遷移）を管理するエンジン
+
+    キー入力は `press` に ACTION_* として渡し、テキスト画面の送りは
+    `next_after_text` を呼ぶ。描画は一切行わない。
+    """
+    __slots__ = (
+        "event_manager", "streams", "inputs", "state", "player", "phase", "current_event", "current_enemy",
+        "message", "sub_message", "message_id", "message_arg", "message_hp", "message_serial",
+        "dice_result", "choice", "battle_result", "battle_continue", "battle_settled", "game_over_pending",
+        "telemetry",
+    )
+
+    # ゲーム状態
+    STATE_TITLE = 0
+    STATE_EVENT = 1
+    STATE_BATTLE = 2
+    STATE_BATTLE_ROLL = 3  # ダイスロール前の戦闘状態
+    STATE_ENDING = 4
+    STATE_GAME_OVER = 5
+    STATE_TEXT = 6  # テキスト表示状態
+
+    def __init__(self, event_manager: Optional[EventManager] = None,
+                 rng: Optional[random.Random] = None, seed: Optional[int] = None,
+                 record: bool = False, streams: Optional["RngStreams"] = None):
+        self.event_manager = event_manager or EventManager()
+        self.streams = streams or RngStreams(seed, rng)
+        self.inputs = bytearray() if record else None  # 入力の記録（ACTION_*を1バイトずつ）
+        self.state = self.STATE_TITLE
+        self.player = Player()
+        self.phase = 1  # 現在のフェーズ (1-event_manager.max_phase)
+        self.current_event = None
+        self.current_enemy = None
+        self.message = ""
+        self.sub_message = ""
+        self.message_id = MSG_NONE
+        self.message_arg = 0
+        self.message_hp = None  # サブメッセージに出すHP（なければNone）
+        self.message_serial = 0  # show_messageのたびに増える（フロントエンドのタイマー用）
+        self.dice_result = 0
+        self.choice = 0  # 選択 (0: 左/はい, 1: 右/いいえ)
+        self.battle_result = False
+        self.battle_continue = False  # 戦闘継続フラグ
+        self.battle_settled = False  # 勝利後の回復判定済みフラグ
+        self.game_over_pending = False  # ゲームオーバー保留フラグ
+        self.telemetry = None  # record(kind, phase, hp, a, b) を持つ記録先（telemetry.TelemetrySink など）
+
+    def emit(self, kind: int, a: int = 0, b: int = 0) -> None:
+        """テレメトリに1件記録する（記録先がなければ何もしない）"""
+        if self.telemetry is not None:
+            self.telemetry.record(kind, self.phase, self.player.hp, a, b)
+
+    def press(self, action: int) -> None:
+        """入力処理"""
+        if self.inputs is not None:
+            self.inputs.append(action)
+
+        if self.state == self.STATE_TITLE:
+            if action == ACTION_CONFIRM:
+                self.start_game()
+
+        elif self.state == self.STATE_TEXT:
+            if action == ACTION_CONFIRM:
+                self.next_after_text()  # テキスト後の処理へ
+
+        elif self.state == self.STATE_BATTLE_ROLL:
+            if action == ACTION_CONFIRM:
+                self.roll_dice()  # ダイスロール実行
+
+        elif self.state == self.STATE_BATTLE:
+            if action == ACTION_CONFIRM:
+                if self.battle_result:
+                    self.show_message(MSG_WIN)
+                else:
+                    damage = battle_damage(self.phase, self.current_enemy, self.event_manager.max_phase)
+                    self.show_message(MSG_LOSE, damage, show_hp=True)
+                    # ゲームオーバー保留中でなければ、同じ敵との戦闘を続ける
+                    self.battle_continue = not self.game_over_pending
+
+        elif self.state in (self.STATE_GAME_OVER, self.STATE_ENDING):
+            if action == ACTION_CONFIRM:
+                self.state = self.STATE_TITLE  # タイトル画面に戻る
+
+        elif self.state == self.STATE_EVENT:
+            if action == ACTION_LEFT:
+                self.choice = 0
+            elif action == ACTION_RIGHT:
+                self.choice = 1
+            elif action == ACTION_CONFIRM:
+                self.resolve_event()
+
+    def resolve_event(self) -> None:
+        """イベント画面での決定処理"""
+        self.emit(TELEMETRY_CHOICE, self.current_event, self.choice)
+        if self.current_event == EVENT_PATH:  # 道イベント
+            if self.choice == 0:
+                self.show_message(MSG_LEFT)
+            else:
+                self.show_message(MSG_RIGHT)
+
+        elif self.current_event == EVENT_REST:  # 休憩イベント
+            self.show_message(MSG_REST)
+
+        elif self.current_event == EVENT_WATER:  # 水場イベント
+            if self.choice == 0:  # 飲む
+                hp = self.player.hp
+                if self.streams.water.random() < WATER_HEAL_CHANCE:
+                    self.player.heal(1)
+                    self.show_message(MSG_WATER_GOOD, show_hp=True)
+                    if self.player.hp != hp:
+                        self.emit(TELEMETRY_HP, hp, EVENT_WATER)
+                else:
+                    self.player.damage(1)
+                    self.show_message(MSG_WATER_BAD, show_hp=True)
+                    self.emit(TELEMETRY_HP, hp, EVENT_WATER)
+                    if not self.player.is_alive():
+                        self.game_over()
+            else:  # 飲まない
+                self.show_message(MSG_WATER_SKIP)
+
+        elif self.current_event == EVENT_CHEST:  # 宝箱イベント
+            if self.choice == 0:  # 開ける
+                result = int(self.streams.chest.random() * 3) + 1
+                if result == 1:  # 空
+                    self.show_message(MSG_CHEST_EMPTY)
+                elif result == 2:  # 回復
+                    hp = self.player.hp
+                    self.player.heal(1)
+                    if self.player.hp != hp:  # HPが満タンなら変化はない
+                        self.emit(TELEMETRY_HP, hp, EVENT_CHEST)
+                    self.show_message(MSG_CHEST_POTION, show_hp=True)
+                else:  # 罠（戦闘）
+                    self.show_message(MSG_CHEST_TRAP)
+                    # メッセージ表示後に戦闘を開始するため、current_eventを設定するだけにする
+                    self.current_event = EVENT_BATTLE
+            else:  # 開けない
+                self.show_message(MSG_CHEST_SKIP)
+
+    def advance(self) -> None:
+        """テキスト画面のタイマーによる自動送り（入力として記録される）"""
+        if self.inputs is not None:
+            self.inputs.append(ACTION_ADVANCE)
+        if self.state == self.STATE_TEXT:
+            self.next_after_text()
+
+    def next_after_text(self) -> None:
+        """テキスト表示後の処理"""
+        # ゲームオーバー保留中の場合はここでゲームオーバー処理
+        if self.game_over_pending:
+            self.game_over_pending = False
+            self.game_over()
+            return
+
+        # 宝箱から敵が出てきた場合の処理
+        if self.current_event == EVENT_BATTLE and self.current_enemy is None:
+            self.start_battle()
+            return
+
+        # 戦闘後の処理
+        if self.current_event == EVENT_BATTLE and not self.battle_settled:
+            if self.battle_result:
+                # 20%の確率で勝利後に回復（回復判定は1回の勝利につき1回だけ）
+                self.battle_settled = True
+                healed = self.streams.heal.random() < HEAL_CHANCE
+                if healed:
+                    hp = self.player.hp
+                    self.player.heal(1)
+                    if self.player.hp != hp:
+                        self.emit(TELEMETRY_HP, hp, EVENT_BATTLE)
+
+                # 最終戦闘ならエンディングへ
+                if self.phase == self.event_manager.max_phase:
+                    self.ending()
+                    return
+
+                if healed:
+                    self.show_message(MSG_WIN_HEAL, show_hp=True)
+                    return
+            else:
+                # 最終戦闘で敗北した場合
+                if self.phase == self.event_manager.max_phase:
+                    self.game_over()
+                    return
+
+                # 戦闘継続フラグがある場合、同じ敵との戦闘を続ける
+                if self.battle_continue:
+                    self.battle_continue = False
+                    self.show_message(MSG_BLOCKED)
+                    self.state = self.STATE_BATTLE_ROLL
+                    return
+
+        # 次のフェーズへ
+        if self.phase < self.event_manager.max_phase:
+            self.phase += 1
+            self.next_event()
+        else:
+            self.ending()
+
+    def start_game(self) -> None:
+        """ゲーム開始"""
+        self.state = self.STATE_EVENT
+        self.player = Player()
+        self.phase = 1
+        self.game_over_pending = False
+        self.emit(TELEMETRY_START)
+        self.next_event()
+
+    def next_event(self) -> None:
+        """次のイベント設定"""
+        self.current_event = self.event_manager.get_event(self.phase, self.streams.event)
+        self.current_enemy = None  # 前のフェーズの敵を持ち越さない
+        self.choice = 0  # 選択リセット
+        self.emit(TELEMETRY_EVENT, self.current_event)
+
+        if self.current_event == EVENT_BATTLE:  # 戦闘イベント
+            self.start_battle()
+        elif self.current_event == EVENT_REST:  # 休憩イベント
+            self.show_message(MSG_REST)
+        else:  # 道・水場・宝箱イベント
+            self.state = self.STATE_EVENT
+
+    def start_battle(self) -> None:
+        """戦闘開始"""
+        self.current_enemy = self.event_manager.get_enemy(self.phase, self.streams.enemy)
+        self.battle_continue = False  # 戦闘継続フラグをリセット
+        self.battle_settled = False
+        self.state = self.STATE_BATTLE_ROLL
+        enemy = self.current_enemy
+        self.emit(TELEMETRY_BATTLE, 255 if enemy.enemy_id is None else enemy.enemy_id, enemy.target)
+
+    def roll_dice(self) -> None:
+        """ダイスロール実行"""
+        self.dice_result = roll_d10(self.streams.dice)
+        self.battle_result = self.dice_result <= self.current_enemy.target
+        self.emit(TELEMETRY_DICE, self.dice_result, self.battle_result)
+
+        if not self.battle_result:
+            hp = self.player.hp
+            self.player.damage(battle_damage(self.phase, self.current_enemy, self.event_manager.max_phase))
+            self.emit(TELEMETRY_HP, hp, EVENT_BATTLE)
+            # HPが0になっても結果表示のため、ゲームオーバー処理は行わない
+            self.game_over_pending = not self.player.is_alive()
+
+        self.state = self.STATE_BATTLE
+
+    def show_message(self, message_id: int, arg: int = 0, show_hp: bool = False) -> None:
+        """メッセージ表示
+
+        arg は {damage} に入る値（{enemy} は current_enemy の名前）、show_hp=True ならサブメッセージに現在のHPを出す。
+        """
+        self.message_id = message_id
+        self.message_arg = arg
+        self.message_hp = self.player.hp if show_hp else None
+        self.render_message()
+        self.state = self.STATE_TEXT
+        self.message_serial += 1
+
+    def render_message(self) -> None:
+        """メッセージIDと引数から表示用の文字列を作る"""
+        template = MESSAGES[self.message_id]
+        if "{" in template:
+            enemy = self.current_enemy.name if self.current_enemy else ""
+            template = template.format(enemy=enemy, damage=self.message_arg)
+        self.message = format_message(template)
+        self.sub_message = "" if self.message_hp is None else f"HP: {self.message_hp}/{self.player.max_hp}"
+
+    def game_over(self) -> None:
+        """ゲームオーバー処理"""
+        self.state = self.STATE_GAME_OVER
+        self.emit(TELEMETRY_END, 0)
+
+    def ending(self) -> None:
+        """クリア処理"""
+        self.state = self.STATE_ENDING
+        self.emit(TELEMETRY_END, 1)
+
+    def is_finished(self) -> bool:
+        """ランが終了したか（クリアまたはゲームオーバー）"""
+        return self.state in (self.STATE_ENDING, self.STATE_GAME_OVER)
+
+
+class Simulator:
+    """高速シミュレーター
+
+    `GameEngine` と同じように乱数ストリームを消費しながら、1ランを状態遷移なしで
+    まとめて解決する。同じシードなら `GameEngine` を常に決定ボタンで
+    進めたとき（drink/open_chest が True の場合）と同じ結果になる。
+    """
+    def __init__(self, event_manager: Optional[EventManager] = None,
+                 rng: Optional[random.Random] = None, seed: Optional[int] = None,
+                 drink: bool = True, open_chest: bool = True):
+        self.event_manager = event_manager or EventManager()
+        self.streams = RngStreams(seed, rng)
+        self.drink = drink
+        self.open_chest = open_chest
+        self.compile()
+
+    def compile(self) -> None:
+        """EventManager の抽選表を取り込む（テーブル変更後に再度呼ぶ）"""
+        em = self.event_manager
+        em.compile()
+        self._cum_weights = em.event_tables
+        self._enemies = em.enemy_tables  # (名前, 目標値, 敵ID)。長いキャンペーンではフェーズごとに遅延生成される
+        self._boss_target = em.boss_target()
+        self.max_phase = em.max_phase
+
+    def play(self) -> Tuple[bool, int, int]:
+        """1ランを実行し (クリアしたか, 終了フェーズ, 終了時HP) を返す"""
+        streams = self.streams
+        event_rand = streams.event.random
+        enemy_rand = streams.enemy.random
+        dice_rand = streams.dice.random
+        cum_weights = self._cum_weights
+        enemies = self._enemies
+        max_phase = self.max_phase
+        drink = self.drink
+        open_chest = self.open_chest
+        hp = MAX_HP
+        for phase in range(1, max_phase + 1):
+            if phase == max_phase:
+                event = EVENT_BATTLE
+            else:
+                cum, total = cum_weights[phase]
+                event = bisect(cum, event_rand() * total, 0, 4) + 1
+
+            if event == EVENT_WATER:
+                if drink:
+                    if streams.water.random() < WATER_HEAL_CHANCE:
+                        if hp < MAX_HP:
+                            hp += 1
+                    else:
+                        hp -= 1
+                        if hp <= 0:
+                            return False, phase, 0
+                continue
+            if event == EVENT_CHEST:
+                if not open_chest:
+                    continue
+                result = int(streams.chest.random() * 3)
+                if result == 1:
+                    if hp < MAX_HP:
+                        hp += 1
+                    continue
+                if result == 0:
+                    continue
+                event = EVENT_BATTLE  # 罠
+            if event != EVENT_BATTLE:
+                continue
+
+            # 戦闘（勝つか倒れるまで同じ敵と戦う）
+            if phase == max_phase:
+                target, damage = self._boss_target, BOSS_DAMAGE
+            else:
+                cands = enemies[phase]
+                target, damage = cands[int(enemy_rand() * len(cands))][1], 1
+            while int(dice_rand() * 10) + 1 > target:
+                hp -= damage
+                if hp <= 0:
+                    return False, phase, 0
+            if streams.heal.random() < HEAL_CHANCE and hp < MAX_HP:
+                hp += 1
+        return True, max_phase, hp
+
+    def run(self, n: int) -> Dict[str, object]:
+        """n回のランを実行して集計する"""
+        play = self.play
+        wins = 0
+        death_phases = [0] * (self.max_phase + 1)
+        end_hp = [0] * (MAX_HP + 1)
+        for _ in range(n):
+            cleared, phase, hp = play()
+            if cleared:
+                wins += 1
+                end_hp[hp] += 1
+            else:
+                death_phases[phase] += 1
+        return {
+            "runs": n,
+            "wins": wins,
+            "clear_rate": wins / n if n else 0.0,
+            "death_phases": death_phases,
+            "end_hp": end_hp,
+        }
@@ -0,0 +1,324 @@
+"""状態空間の全探索と不変条件のチェック
+
+GameEngine の到達可能な状態（画面・フェーズ・HP・イベント・敵・フラグ）を、すべての
+キー入力とすべての乱数の結果で分岐しながら幅優先で列挙する。乱数は「神託」ストリームに
+差し替え、1回の遷移で引かれる乱数の組み合わせをすべて試す。訪問済みの状態はハッシュ
+集合で重複を除く。
+
+見つけるもの:
+- 不変条件の違反（HP0なのにゲームが続く、戦闘画面に敵がいない、前の戦闘の敵が残っている など）
+- 遷移の違反（宝箱の罠のあとに戦闘にならない、新しい戦闘の敵がそのフェーズの敵でない など）
+- 行き止まり: どの入力でも状態が変わらない状態
+- ソフトロック: タイトル画面に戻れなくなる状態
+- 遷移中の例外
+
+    python explorer.py            # 問題があれば終了コード1
+"""
+import argparse
+import sys
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from engine import (
+    MAX_PHASE, MAX_HP, HEAL_CHANCE, WATER_HEAL_CHANCE, BOSS_NAME,
+    EVENT_PATH, EVENT_BATTLE, EVENT_WATER, EVENT_CHEST, MSG_CHEST_TRAP, MSG_LOSE,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM, ACTION_ADVANCE,
+    CONTENT_PATH, Enemy, EventManager, GameEngine, load_content,
+)
+
+ACTIONS = (ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM, ACTION_ADVANCE)
+ACTION_NAMES = {ACTION_LEFT: "←", ACTION_RIGHT: "→", ACTION_CONFIRM: "決定", ACTION_ADVANCE: "自動送り"}
+
+# 状態: (画面, フェーズ, HP, イベント, 敵(名前, 目標値, 敵ID)かNone, 選択, 出目, 戦闘結果,
+#        戦闘継続, 回復判定済み, ゲームオーバー保留, メッセージID, メッセージ引数, メッセージのHP)
+State = tuple
+
+
+def state_key(engine: GameEngine) -> State:
+    """エンジンの状態をハッシュできるタプルにする（message_serial のような単調な値は含めない）"""
+    enemy = engine.current_enemy
+    return (
+        engine.state, engine.phase, engine.player.hp, engine.current_event,
+        (enemy.name, enemy.target, enemy.enemy_id) if enemy else None,
+        engine.choice, engine.dice_result, engine.battle_result,
+        engine.battle_continue, engine.battle_settled, engine.game_over_pending,
+        engine.message_id, engine.message_arg, engine.message_hp,
+    )
+
+
+def restore_key(engine: GameEngine, key: State) -> None:
+    """state_key の値をエンジンに戻す"""
+    (engine.state, engine.phase, engine.player.hp, engine.current_event, enemy,
+     engine.choice, engine.dice_result, engine.battle_result,
+     engine.battle_continue, engine.battle_settled, engine.game_over_pending,
+     engine.message_id, engine.message_arg, engine.message_hp) = key
+    engine.current_enemy = Enemy(*enemy) if enemy else None
+    engine.render_message()
+
+
+class Oracle:
+    """乱数の代わりに、指定された結果の番号を順に返す
+
+    script にない乱数が引かれたら結果0を選び、その乱数の結果の数を branches に記録する
+    （探索側はそれを見て残りの組み合わせを試す）。
+    """
+    def __init__(self, engine: GameEngine, script: List[int]):
+        self.engine = engine
+        self.script = script
+        self.position = 0
+        self.branches: List[int] = []
+
+    def draw(self, name: str) -> float:
+        options = self.options(name)
+        if self.position < len(self.script):
+            index = self.script[self.position]
+        else:
+            index = 0
+            self.branches.append(len(options))
+        self.position += 1
+        return options[index]
+
+    def options(self, name: str) -> List[float]:
+        """乱数の結果ごとの代表値（その結果になる区間の中点）"""
+        engine = self.engine
+        if name == "event":
+            cum_weights, total = engine.event_manager.event_tables[engine.phase]
+            bounds = [0] + list(cum_weights)
+            return [(low + high) / 2 / total for low, high in zip(bounds, bounds[1:]) if high > low]
+        if name == "enemy":
+            count = len(engine.event_manager.enemy_tables[engine.phase])
+            return [(i + 0.5) / count for i in range(count)]
+        if name == "dice":
+            return [(i + 0.5) / 10 for i in range(10)]
+        if name == "chest":
+            return [1 / 6, 1 / 2, 5 / 6]
+        if name == "water":
+            return [WATER_HEAL_CHANCE / 2, (1 + WATER_HEAL_CHANCE) / 2]
+        if name == "heal":
+            return [HEAL_CHANCE / 2, (1 + HEAL_CHANCE) / 2]
+        raise KeyError(name)
+
+
+class OracleStream:
+    """Oracle から値を引く乱数ストリーム（random.Random の random() だけを持つ）"""
+    __slots__ = ("oracle", "name")
+
+    def __init__(self, oracle: Oracle, name: str):
+        self.oracle = oracle
+        self.name = name
+
+    def random(self) -> float:
+        return self.oracle.draw(self.name)
+
+
+class OracleStreams:
+    """RngStreams と同じ属性名で OracleStream を持つ"""
+    def __init__(self, oracle: Oracle):
+        for name in ("event", "enemy", "dice", "water", "chest", "heal"):
+            setattr(self, name, OracleStream(oracle, name))
+
+
+def check_invariants(key: State, max_phase: int = MAX_PHASE) -> List[str]:
+    """状態が満たすべき条件を調べ、破れているものの説明を返す"""
+    (state, phase, hp, event, enemy, choice, dice, battle_result,
+     battle_continue, battle_settled, game_over_pending, message_id, message_arg, message_hp) = key
+    problems = []
+    if not 0 <= hp <= MAX_HP:
+        problems.append(f"HPが範囲外: {hp}")
+    if not 1 <= phase <= max_phase:
+        problems.append(f"フェーズが範囲外: {phase}")
+    if choice not in (0, 1):
+        problems.append(f"選択が不正: {choice}")
+    if state == GameEngine.STATE_TITLE:
+        return problems  # タイトル画面では前のランの値が残っていてよい
+    if hp <= 0 and state != GameEngine.STATE_GAME_OVER and not game_over_pending:
+        problems.append("HPが0なのにゲームが続いている")
+    if game_over_pending and hp > 0:
+        problems.append("HPが残っているのにゲームオーバーが保留されている")
+    if state == GameEngine.STATE_GAME_OVER and hp > 0:
+        problems.append("HPが残っているのにゲームオーバー")
+    if state == GameEngine.STATE_ENDING and (hp <= 0 or phase != max_phase):
+        problems.append(f"最終フェーズ以外かHP0でエンディング（フェーズ{phase}, HP{hp}）")
+    if state in (GameEngine.STATE_BATTLE, GameEngine.STATE_BATTLE_ROLL) and enemy is None:
+        problems.append("戦闘画面なのに敵がいない")
+    if state == GameEngine.STATE_EVENT and event not in (EVENT_PATH, EVENT_WATER, EVENT_CHEST):
+        problems.append(f"選択肢のないイベントでイベント画面: {event}")
+    if state == GameEngine.STATE_BATTLE and not 1 <= dice <= 10:
+        problems.append(f"戦闘結果の画面で出目が不正: {dice}")
+    # 戦闘中（戦闘イベントの結果のテキストまで）以外の画面に敵が残っていてはいけない
+    in_battle = event == EVENT_BATTLE and message_id != MSG_CHEST_TRAP
+    if state in (GameEngine.STATE_EVENT, GameEngine.STATE_TEXT) and enemy is not None and not in_battle:
+        problems.append(f"戦闘の前なのに敵が残っている: {enemy[0]}")
+    return problems
+
+
+def check_transition(key: State, action: int, next_key: State, event_manager: EventManager) -> List[str]:
+    """1回の遷移が満たすべき条件を調べ、破れているものの説明を返す"""
+    state, phase, message_id = key[0], key[1], key[11]
+    next_state, next_phase, next_enemy = next_key[0], next_key[1], next_key[4]
+    problems = []
+    trap = (state == GameEngine.STATE_TEXT and message_id == MSG_CHEST_TRAP
+            and action in (ACTION_ADVANCE, ACTION_CONFIRM))
+    if trap and next_state != GameEngine.STATE_BATTLE_ROLL:
+        problems.append(f"宝箱の罠のあとに戦闘にならない（次の画面 {STATE_NAMES[next_state]}）")
+    # 新しく始まった戦闘（同じ敵との戦闘の続きを除く）の敵は、そのフェーズで抽選されたもの
+    continuing = state == GameEngine.STATE_BATTLE_ROLL or (
+        state == GameEngine.STATE_TEXT and message_id == MSG_LOSE)
+    if next_state == GameEngine.STATE_BATTLE_ROLL and not continuing:
+        if next_phase == event_manager.max_phase:
+            fresh = next_enemy is not None and next_enemy[0] == BOSS_NAME
+        else:
+            fresh = next_enemy in event_manager.enemy_tables[next_phase]
+        if not fresh:
+            problems.append(f"フェーズ{next_phase}の戦闘の敵がそのフェーズの敵ではない: {next_enemy}")
+    return problems
+
+
+class StateExplorer:
+    """到達可能な状態の幅優先探索"""
+    def __init__(self, event_manager: Optional[EventManager] = None, max_states: int = 1_000_000):
+        self.engine = GameEngine(event_manager)
+        self.max_states = max_states
+        self.parents: Dict[State, Optional[Tuple[State, int]]] = {}  # 最初に見つけたときの (前の状態, 入力)
+        self.edges: Dict[State, set] = {}
+        self.errors: List[Tuple[State, int, str]] = []
+        self.bad_transitions: List[Tuple[State, int, State, str]] = []  # (状態, 入力, 次の状態, 問題)
+        self.transitions = 0
+        self.truncated = False  # max_states に達して探索を打ち切った
+
+    def successors(self, key: State, action: int) -> List[State]:
+        """key で action を入力したときの、すべての乱数の結果での次の状態"""
+        engine = self.engine
+        results = []
+        pending = [[]]
+        while pending:
+            script = pending.pop()
+            restore_key(engine, key)
+            oracle = Oracle(engine, script)
+            engine.streams = OracleStreams(oracle)
+            if action == ACTION_ADVANCE:
+                engine.advance()
+            else:
+                engine.press(action)
+            self.transitions += 1
+            results.append(state_key(engine))
+            # 新しく引かれた乱数の、まだ試していない結果を積む
+            base = script + [0] * len(oracle.branches)
+            for i, count in enumerate(oracle.branches):
+                position = len(script) + i
+                for option in range(1, count):
+                    pending.append(base[:position] + [option])
+        return results
+
+    def explore(self) -> None:
+        """タイトル画面から到達できる状態をすべて列挙する"""
+        start = state_key(self.engine)
+        self.parents[start] = None
+        queue = deque([start])
+        while queue and len(self.parents) < self.max_states:
+            key = queue.popleft()
+            edges = self.edges[key] = set()
+            for action in ACTIONS:
+                try:
+                    nexts = self.successors(key, action)
+                except Exception as e:  # 遷移中の例外も問題として記録する
+                    self.errors.append((key, action, f"{type(e).__name__}: {e}"))
+                    continue
+                for next_key in nexts:
+                    for problem in check_transition(key, action, next_key, self.engine.event_manager):
+                        self.bad_transitions.append((key, action, next_key, problem))
+                    edges.add(next_key)
+                    if next_key not in self.parents:
+                        self.parents[next_key] = (key, action)
+                        queue.append(next_key)
+        self.truncated = bool(queue)
+
+    def path_to(self, key: State) -> List[int]:
+        """タイトル画面から key に着く入力列"""
+        actions = []
+        while self.parents.get(key) is not None:
+            key, action = self.parents[key]
+            actions.append(action)
+        return actions[::-1]
+
+    def report(self) -> Dict[str, list]:
+        """不変条件の違反・遷移の違反・行き止まり・ソフトロック・例外
+
+        探索を打ち切った場合、展開していない状態の先は分からないので、そこからはタイトル画面に
+        戻れるものとみなす（先をすべて展開した状態だけをソフトロックとして報告する）。
+        """
+        max_phase = self.engine.event_manager.max_phase
+        violations = [(key, problem) for key in self.parents for problem in check_invariants(key, max_phase)]
+        dead_ends = [key for key, edges in self.edges.items() if edges <= {key}]
+
+        # タイトル画面に戻れる状態を逆向きにたどる
+        reverse: Dict[State, List[State]] = {}
+        for key, edges in self.edges.items():
+            for next_key in edges:
+                reverse.setdefault(next_key, []).append(key)
+        can_return = {key for key in self.parents
+                      if key[0] == GameEngine.STATE_TITLE or key not in self.edges}
+        queue = deque(can_return)
+        while queue:
+            for prev in reverse.get(queue.popleft(), ()):
+                if prev not in can_return:
+                    can_return.add(prev)
+                    queue.append(prev)
+        soft_locks = [key for key in self.edges if key not in can_return]
+        return {"violations": violations, "transitions": self.bad_transitions,
+                "dead_ends": dead_ends, "soft_locks": soft_locks, "errors": self.errors}
+
+
+STATE_NAMES = {value: name[len("STATE_"):].lower()
+               for name, value in vars(GameEngine).items() if name.startswith("STATE_")}
+
+
+def describe(key: State) -> str:
+    """状態の要約（問題の報告用）"""
+    (state, phase, hp, event, enemy, *_rest) = key
+    enemy_name = enemy[0] if enemy else "-"
+    return f"{STATE_NAMES[state]} フェーズ{phase} HP{hp} イベント{event} 敵{enemy_name}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG 状態空間の全探索")
+    parser.add_argument("--content", default=CONTENT_PATH, help="コンテンツファイル")
+    parser.add_argument("--examples", type=int, default=3, help="問題ごとに表示する例の数")
+    parser.add_argument("--max-states", type=int, default=1_000_000)
+    parser.add_argument("--campaign", metavar="LENGTH", type=int, help="長いキャンペーン（フェーズ数）を探索する")
+    parser.add_argument("--campaign-seed", type=int, default=0, help="キャンペーンの生成シード")
+    args = parser.parse_args()
+
+    content = load_content(args.content)
+    if args.campaign:
+        from campaign import Campaign
+        event_manager = Campaign(args.campaign, args.campaign_seed, content)
+    else:
+        event_manager = EventManager(content)
+    explorer = StateExplorer(event_manager, args.max_states)
+    explorer.explore()
+    report = explorer.report()
+    print(f"状態: {len(explorer.parents)}  遷移: {explorer.transitions}")
+    if explorer.truncated:
+        print(f"状態数が上限（--max-states {args.max_states}）に達したので探索を打ち切った"
+              f"（未展開の状態 {len(explorer.parents) - len(explorer.edges)}）")
+
+    def show(title: str, items: list, key_of: Callable, detail: Callable) -> None:
+        print(f"{title}: {len(items)}")
+        for item in items[:args.examples]:
+            key = key_of(item)
+            path = " ".join(ACTION_NAMES[a] for a in explorer.path_to(key))
+            print(f"  {describe(key)} {detail(item)}\n    入力: {path}")
+
+    show("不変条件の違反", report["violations"], lambda item: item[0], lambda item: item[1])
+    show("遷移の違反", report["transitions"], lambda item: item[0],
+         lambda item: f"{ACTION_NAMES[item[1]]} で {item[3]}")
+    show("行き止まり", report["dead_ends"], lambda key: key, lambda key: "")
+    show("ソフトロック", report["soft_locks"], lambda key: key, lambda key: "")
+    show("例外", report["errors"], lambda item: item[0],
+         lambda item: f"{ACTION_NAMES[item[1]]} で {item[2]}")
+    return 1 if explorer.truncated or any(report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,32 @@
+import time
+LAUNCH_TIME = time.perf_counter()  # 起動時間計測の基準（pygameのインポートより前）
+
+import argparse
+import json
+import math
+import os
 import pygame
 import random
 import sys
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional, Union
 
-# Initialize pygame
-pygame.init()
+from engine import (
+    MESSAGE_SECONDS, EVENT_PATH, EVENT_WATER, EVENT_CHEST,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM,
+    Enemy, Player, EventManager, GameEngine,
+)
+from profiler import FrameProfiler
+from textlayout import TextLayout
 
 # Constants
 SCREEN_WIDTH = 640
 SCREEN_HEIGHT = 480
-FPS = 60
+FPS = 60  # 描画の既定フレームレート（--fps で変更でき、ゲームの時間の進み方には影響しない）
+TICK_RATE = 60  # ゲーム内時計の固定刻み（1秒あたりのティック数）
+TICK_SECONDS = 1.0 / TICK_RATE
+MESSAGE_TICKS = TICK_RATE * MESSAGE_SECONDS  # テキスト画面を自動で送るまでのティック数
+MAX_CATCH_UP_TICKS = 15  # 1フレームで追いつくティック数の上限（低FPSでは2フレーム分まで広げる。これを超えた遅れは捨てる）
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
@@ -17,535 +34,708 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 GRAY = (150, 150, 150)
 
+# OS別の日本語フォント
+if sys.platform.startswith('win'):
+    FONT_NAME = "Yu Gothic"
+elif sys.platform.startswith('darwin'):  # macOS
+    FONT_NAME = "Hiragino Sans"
+else:  # Linux
+    FONT_NAME = "Noto Sans CJK JP"
 
-class Enemy:
-    """敵クラス"""
-    def __init__(self, name: str, target: int):
-        self.name = name
-        self.target = target  # ダイスロールの目標値（ロール <= target で勝利）
+# 解決済みフォントパスのキャッシュファイル
+FONT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "miniRPG", "fonts.json"
+)
 
+TEXT_CACHE_SIZE = 256  # 描画済みテキストをキャッシュする最大数
+MESSAGE_WIDTH = SCREEN_WIDTH - 80  # テキスト画面のメッセージの折り返し幅（左右に40ピクセルずつ余白）
+MESSAGE_LINES = 3  # テキスト画面の1ページの行数（これを超えるメッセージはページを分ける）
 
-class Player:
-    """プレイヤークラス"""
-    def __init__(self):
-        self.hp = 3
-        self.max_hp = 3
-    
-    def heal(self, amount: int) -> None:
-        """HPを回復"""
-        self.hp = min(self.hp + amount, self.max_hp)
-    
-    def damage(self, amount: int) -> None:
-        """ダメージを受ける"""
-        self.hp = max(self.hp - amount, 0)
-    
-    def is_alive(self) -> bool:
-        """生存確認"""
-        return self.hp > 0
 
+def init_pygame(display: bool = True) -> None:
+    """必要なpygameモジュール（画面とフォント）だけを初期化する
 
-class EventManager:
-    """イベント管理クラス"""
-    def __init__(self):
-        # イベントID: (タイプ, 説明, 序盤の重み, 終盤の重み)
-        self.events = {
-            1: ("道", "道が分かれている。左右どちらに進む？", 30, 15),
-            2: ("戦闘", "洞窟のモンスターが現れた！", 10, 40),
-            3: ("休憩", "静かな場所。何も起こらない。", 25, 10),
-            4: ("水場", "壁から水が流れている。飲む？", 20, 10),
-            5: ("宝箱", "古い宝箱を見つけた。開ける？", 15, 25)
-        }
-        
-        # 敵タイプ: (名前, 目標値, 最小フェーズ, 最大フェーズ)
-        self.enemies = [
-            ("コウモリ", 7, 1, 3),
-            ("ゴブリン", 6, 2, 5),
-            ("オーク", 5, 4, 7),
-            ("トロール", 4, 6, 9),
-            ("洞窟の王", 3, 10, 10)  # ボス
-        ]
-    
-    def get_event(self, phase: int) -> int:
-        """フェーズに基づいてランダムイベントを選択"""
-        if phase == 10:
-            return 2  # フェーズ10は常に戦闘
-        
-        # 序盤/終盤で重みを変更
-        is_first_half = phase <= 5
-        weights = [self.events[i][2 if is_first_half else 3] for i in range(1, 6)]
-        
-        return random.choices(range(1, 6), weights=weights)[0]
-    
-    def get_enemy(self, phase: int) -> Enemy:
-        """フェーズに基づいて敵を選択"""
-        candidates = []
-        
-        for name, target, min_phase, max_phase in self.enemies:
-            if min_phase <= phase <= max_phase:
-                candidates.append((name, target))
-        
-        # フェーズ10は常にボス
-        if phase == 10:
-            return Enemy("洞窟の王", 3)
-        
-        name, target = random.choice(candidates)
-        return Enemy(name, target)
+    pygame.init() はサウンドやジョイスティックまで初期化して遅いので使わない。
+    display=False ならフォントだけ（オフスクリーン描画用）。
+    """
+    if display and not pygame.display.get_init():
+        pygame.display.init()
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+
+def resolve_font_path(name: str, cache_path: str = FONT_CACHE_PATH) -> Optional[str]:
+    """フォント名からフォントファイルのパスを解決する
+
+    システムフォントの列挙（Linuxではfc-list）は遅いので、結果をディスクにキャッシュする。
+    見つからなければNone（pygame標準フォントを使う）。見つからなかったこともnullとして
+    キャッシュするので、フォントを入れたらキャッシュファイルを消す。
+    """
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    if name in cache:
+        path = cache[name]
+        if path is None:
+            return None  # 前回見つからなかった
+        if os.path.exists(path):
+            return path
+
+    path = pygame.font.match_font(name) or None
+    cache[name] = path
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    except OSError:
+        pass  # キャッシュが書けなくてもゲームは動く
+    return path
+
+
+class TextCache:
+    """描画済みテキストサーフェスのLRUキャッシュ
+
+    (フォント, 文字列, 色) をキーに font.render の結果を保持する。
+    日本語グリフのラスタライズは重いので、毎フレーム同じ文字列を描き直さない。
+    """
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+        """キャッシュがあればそれを、なければ描画して返す"""
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)  # 最も古く使われたものを捨てる
+        return surface
+
+    def clear(self) -> None:
+        """キャッシュと統計をリセット"""
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット/ミス数"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.surfaces)}
+
+
+# 状態ID → 名前（プロファイラの区間名に使う）
+STATE_NAMES = {value: name[len("STATE_"):].lower()
+               for name, value in vars(GameEngine).items() if name.startswith("STATE_")}
+
+# キー入力 → エンジンの入力アクション
+KEY_ACTIONS = {
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_SPACE: ACTION_CONFIRM,
+}
 
 
 class Game:
-    """ゲームクラス"""
+    """ゲームクラス（GameEngineのpygameフロントエンド）"""
     # ゲーム状態
-    STATE_TITLE = 0
-    STATE_EVENT = 1
-    STATE_BATTLE = 2
-    STATE_BATTLE_ROLL = 3  # ダイスロール前の戦闘状態
-    STATE_ENDING = 4
-    STATE_GAME_OVER = 5
-    STATE_TEXT = 6  # テキスト表示状態
-    
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("洞窟探検RPG")
+    STATE_TITLE = GameEngine.STATE_TITLE
+    STATE_EVENT = GameEngine.STATE_EVENT
+    STATE_BATTLE = GameEngine.STATE_BATTLE
+    STATE_BATTLE_ROLL = GameEngine.STATE_BATTLE_ROLL  # ダイスロール前の戦闘状態
+    STATE_ENDING = GameEngine.STATE_ENDING
+    STATE_GAME_OVER = GameEngine.STATE_GAME_OVER
+    STATE_TEXT = GameEngine.STATE_TEXT  # テキスト表示状態
+    
+    def __init__(self, engine: Optional[GameEngine] = None, font_path: Optional[str] = None,
+                 profile: bool = False, fps: int = FPS, agent=None, offscreen: bool = False):
+        init_pygame(display=not offscreen)
+        if offscreen:
+            # ウィンドウを開かずメモリ上のサーフェスに描く（render.py 用）
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), depth=32)
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("洞窟探検RPG")
         self.clock = pygame.time.Clock()
+        self.fps = fps
+        # 1フレームの間隔が上限を超える低FPSでも時間を捨てないように、2フレーム分までは追いつく
+        self.max_catch_up_ticks = max(MAX_CATCH_UP_TICKS, 2 * math.ceil(TICK_RATE / fps))
+        
+        # 日本語フォントの設定（font_path でフォントファイルを直接指定できる）
+        if font_path is None:
+            font_path = resolve_font_path(FONT_NAME)
+        self.font_large = pygame.font.Font(font_path, 48)
+        self.font_medium = pygame.font.Font(font_path, 36)
+        self.font_small = pygame.font.Font(font_path, 24)
+        self.font_tiny = pygame.font.Font(font_path, 16)
+        
+        self.text_cache = TextCache()
+        self.text_layout = TextLayout()
+        self.static_screens: Dict[int, pygame.Surface] = {}  # 内容が変わらない画面の合成結果
+        
+        self.drawn_rects: List[pygame.Rect] = []  # このフレームで描いた矩形（差分更新用）
+        
+        # フレーム時間の計測（F3キーでオーバーレイ表示を切り替え）
+        self.profiler = FrameProfiler(fps) if profile else None
+        self.show_overlay = profile
+        self.overlay_lines: List[pygame.Surface] = []
+        
+        self.engine = engine or GameEngine()
+        self.agent = agent  # イベント画面の判断をキーボードの代わりに行う（agent.Agent）
+        self.message_timer = 0  # 現在のメッセージを表示してからのティック数
+        self.message_serial = self.engine.message_serial
+        self.layout_serial = -1  # message_pages をレイアウトしたメッセージの message_serial
+        self.message_pages: Tuple[Tuple[str, ...], ...] = ((),)
+        self.message_page = 0  # テキスト画面で表示中のページ
+        self.clock_time: Optional[float] = None  # 最後に advance_clock した時刻
+        self.accumulator = 0.0  # まだティックにしていない経過時間（秒）
+        
+    def run(self, event_driven: bool = False):
+        """メインゲームループ
+
+        event_driven=True なら状態が変わったときだけ描き直す（run_event_driven）。
+        """
+        if event_driven:
+            self.run_event_driven()
+            return
         
-        # 日本語フォントの設定（OS別）
-        if sys.platform.startswith('win'):
-            self.font_large = pygame.font.SysFont("Yu Gothic", 48)
-            self.font_medium = pygame.font.SysFont("Yu Gothic", 36)
-            self.font_small = pygame.font.SysFont("Yu Gothic", 24)
-        elif sys.platform.startswith('darwin'):  # macOS
-            self.font_large = pygame.font.SysFont("Hiragino Sans", 48)
-            self.font_medium = pygame.font.SysFont("Hiragino Sans", 36)
-            self.font_small = pygame.font.SysFont("Hiragino Sans", 24)
-        else:  # Linux
-            self.font_large = pygame.font.SysFont("Noto Sans CJK JP", 48)
-            self.font_medium = pygame.font.SysFont("Noto Sans CJK JP", 36)
-            self.font_small = pygame.font.SysFont("Noto Sans CJK JP", 24)
-        
-        self.state = self.STATE_TITLE
-        self.player = Player()
-        self.event_manager = EventManager()
-        self.phase = 1  # 現在のフェーズ (1-10)
-        self.current_event = None
-        self.current_enemy = None
-        self.message = ""
-        self.sub_message = ""
-        self.message_timer = 0
-        self.dice_result = 0
-        self.choice = 0  # 選択 (0: 左/はい, 1: 右/いいえ)
-        self.battle_result = False
-        self.battle_continue = False  # 戦闘継続フラグ
-        self.game_over_pending = False  # ゲームオーバー保留フラグ
-        
-    def run(self):
-        """メインゲームループ"""
         running = True
+        profiler = self.profiler
+        perf = time.perf_counter
+        self.clock_time = None
         
         while running:
+            frame_start = perf()
+            
             # イベント処理
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     self.handle_key_event(event.key)
+            after_events = perf()
             
-            # 状態更新
-            self.update()
+            # 状態更新（フレームレートに関係なく、経過時間ぶんの固定ティックを進める）
+            self.advance_clock(after_events, self.max_catch_up_ticks)
+            after_update = perf()
             
             # 描画
+            state = self.engine.state
             self.screen.fill(BLACK)
             self.draw()
+            after_draw = perf()
             
             pygame.display.flip()
-            self.clock.tick(FPS)
+            if profiler:
+                profiler.record_frame(STATE_NAMES[state], frame_start, after_events - frame_start,
+                                      after_update - after_events, after_draw - after_update,
+                                      perf() - after_draw)
+            self.clock.tick(self.fps)
         
         pygame.quit()
         sys.exit()
     
-    def handle_key_event(self, key):
-        """キー入力処理"""
-        if self.state == self.STATE_TITLE:
-            if key == pygame.K_SPACE:
-                self.start_game()
-        
-        elif self.state == self.STATE_TEXT:
-            if key == pygame.K_SPACE:
-                self.next_after_text()  # テキスト後の処理へ
-        
-        elif self.state == self.STATE_BATTLE_ROLL:
-            if key == pygame.K_SPACE:
-                self.roll_dice()  # ダイスロール実行
-        
-        elif self.state == self.STATE_BATTLE:
-            if key == pygame.K_SPACE:
-                if self.battle_result:
-                    self.show_message("勝利した！")
-                else:
-                    # ラスボスかどうかでメッセージを変える
-                    damage = 3 if self.phase == 10 and self.current_enemy.name == "洞窟の王" else 1
-                    self.show_message(f"敗北した... HPが{damage}減った！", f"HP: {self.player.hp}/{self.player.max_hp}")
-                    
-                    # ゲームオーバー保留中の場合はここでゲームオーバー処理
-                    if self.game_over_pending:
-                        # メッセージ表示後にゲームオーバーになるよう、フラグだけ設定
-                        self.battle_continue = False
-                    else:
-                        # 敗北後、同じ敵との戦闘を続ける
-                        self.battle_continue = True
-        
-        elif self.state == self.STATE_GAME_OVER:
-            if key == pygame.K_SPACE:
-                self.state = self.STATE_TITLE  # タイトル画面に戻る
-        
-        elif self.state == self.STATE_ENDING:
-            if key == pygame.K_SPACE:
-                self.state = self.STATE_TITLE  # タイトル画面に戻る
+    def run_event_driven(self):
+        """イベント駆動のゲームループ
+
+        入力（またはテキスト送りの期限）が来るまでブロックし、表示内容が変わったときだけ
+        描き直して、変化した矩形だけを画面に転送する。何も起きない画面ではCPUをほぼ使わない。
+        """
+        running = True
+        full_redraw = True
+        last_view = None
+        prev_rects: List[pygame.Rect] = []
+        self.clock_time = None
         
-        elif self.state == self.STATE_EVENT:
-            if self.current_event == 1:  # 道イベント
-                if key == pygame.K_LEFT:
-                    self.choice = 0
-                elif key == pygame.K_RIGHT:
-                    self.choice = 1
-                elif key == pygame.K_SPACE:
-                    if self.choice == 0:
-                        self.show_message("左に進んだ。")
-                    else:
-                        self.show_message("右に進んだ。")
+        while running:
+            # 入力かテキスト送りの期限まで待つ
+            timeout = self.next_deadline_ms()
+            if timeout is None:
+                events = [pygame.event.wait()]
+            else:
+                events = [pygame.event.wait(max(timeout, 1))]
+            events.extend(pygame.event.get())
             
-            elif self.current_event == 3:  # 休憩イベント
-                if key == pygame.K_SPACE:
-                    self.show_message("静かな場所で休憩した。何も起こらない。")
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    self.handle_key_event(event.key)
+                elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    full_redraw = True
             
-            elif self.current_event == 4:  # 水場イベント
-                if key == pygame.K_SPACE and self.choice == 0:  # 飲む
-                    if random.random() < 0.5:
-                        self.player.heal(1)
-                        self.show_message("水を飲んだ。体調が良くなった！", f"HP: {self.player.hp}/{self.player.max_hp}")
-                    else:
-                        self.player.damage(1)
-                        self.show_message("水を飲んだ。お腹が痛い...", f"HP: {self.player.hp}/{self.player.max_hp}")
-                        if not self.player.is_alive():
-                            self.game_over()
-                            return
-                elif key == pygame.K_SPACE and self.choice == 1:  # 飲まない
-                    self.show_message("水を飲まなかった。何も起こらない。")
-                elif key == pygame.K_LEFT:
-                    self.choice = 0  # 飲む
-                elif key == pygame.K_RIGHT:
-                    self.choice = 1  # 飲まない
+            # 経過時間ぶんだけ状態更新（期限まで意図して眠っていたので追いつきの上限は掛けない）
+            self.advance_clock(time.perf_counter(), max_ticks=None)
             
-            elif self.current_event == 5:  # 宝箱イベント
-                if key == pygame.K_SPACE and self.choice == 0:  # 開ける
-                    result = random.randint(1, 3)
-                    if result == 1:  # 空
-                        self.show_message("宝箱は空だった...")
-                    elif result == 2:  # 回復
-                        self.player.heal(1)
-                        self.show_message("回復薬を見つけた！", f"HP: {self.player.hp}/{self.player.max_hp}")
-                    else:  # 罠（戦闘）
-                        self.show_message("罠だった！敵が現れた！")
-                        # メッセージ表示後に戦闘を開始するため、current_eventを設定するだけにする
-                        self.current_event = 2  # 戦闘イベントとして扱う
-                elif key == pygame.K_SPACE and self.choice == 1:  # 開けない
-                    self.show_message("宝箱をそのままにした。")
-                elif key == pygame.K_LEFT:
-                    self.choice = 0  # 開ける
-                elif key == pygame.K_RIGHT:
-                    self.choice = 1  # 開けない
-    
-    def update(self):
-        """状態更新"""
-        if self.state == self.STATE_TEXT:
-            self.message_timer += 1
-            if self.message_timer >= FPS * 2:  # 2秒
-                self.next_after_text()
-    
-    def next_after_text(self):
-        """テキスト表示後の処理"""
-        self.message_timer = 0
-        
-        # ゲームオーバー保留中の場合はここでゲームオーバー処理
-        if self.game_over_pending:
-            self.game_over_pending = False
-            self.game_over()
-            return
+            view = self.view_signature()
+            if view == last_view and not full_redraw:
+                continue
+            last_view = view
             
-        # 宝箱から敵が出てきた場合の処理
-        if self.current_event == 2 and self.current_enemy is None:
-            self.start_battle()
-            return
+            # 前回描いた部分を消してから描き直す
+            for rect in prev_rects:
+                self.screen.fill(BLACK, rect)
+            if full_redraw:
+                self.screen.fill(BLACK)
+            self.draw()
             
-        # 戦闘後の処理
-        if self.current_event == 2 and self.current_enemy is not None:  # 敵が存在する場合のみ処理
-            if self.battle_result:
-                # 戦闘に勝利した場合
-                heal_message = ""
-                
-                # 20%の確率で勝利後に回復（戦闘継続フラグがない場合のみ）
-                if not self.battle_continue and random.random() < 0.2:
-                    self.player.heal(1)
-                    heal_message = "\nHPが回復した！"
-                
-                # 最終戦闘ならエンディングへ
-                if self.phase == 10:
-                    self.state = self.STATE_ENDING
-                    return
-                    
-                if heal_message:
-                    self.show_message(f"戦闘に勝利した！{heal_message}", f"HP: {self.player.hp}/{self.player.max_hp}")
-                    return
+            if full_redraw:
+                pygame.display.flip()
+                full_redraw = False
             else:
-                # 敗北時の処理
-                if self.phase == 10:  # 最終戦闘で敗北した場合
-                    self.game_over()
-                    return
-                
-                # 戦闘継続フラグがある場合、同じ敵との戦闘を続ける
-                if self.battle_continue:
-                    self.battle_continue = False
-                    self.show_message(f"{self.current_enemy.name}は道を塞いでいる！")
-                    self.state = self.STATE_BATTLE_ROLL
-                    return
+                pygame.display.update(prev_rects + self.drawn_rects)
+            prev_rects = self.drawn_rects
         
-        # 次のフェーズへ
-        if self.phase < 10:
-            self.phase += 1
-            self.next_event()
+        pygame.quit()
+        sys.exit()
+    
+    def next_deadline_ms(self) -> Optional[int]:
+        """次にタイマーで状態が変わるまでのミリ秒（なければNone）"""
+        if self.agent is not None and self.engine.state == self.STATE_EVENT:
+            return 0  # エージェントの判断待ち: 入力を待たずに update へ
+        if self.engine.state != self.STATE_TEXT:
+            return None
+        if self.engine.message_serial != self.message_serial:
+            return 0  # 新しいメッセージ: タイマーのリセットが先
+        remaining = (MESSAGE_TICKS - self.message_timer) * TICK_SECONDS - self.accumulator
+        return max(0, math.ceil(remaining * 1000))
+    
+    def view_signature(self) -> tuple:
+        """画面に表示される内容を表すタプル（変化がなければ描き直さない）"""
+        engine = self.engine
+        enemy = engine.current_enemy
+        return (
+            engine.state, engine.phase, engine.player.hp, engine.current_event, engine.choice,
+            enemy.name if enemy else None, enemy.target if enemy else None,
+            engine.dice_result, engine.battle_result, engine.message, engine.sub_message, self.message_page,
+        )
+    
+    def handle_key_event(self, key):
+        """キー入力処理"""
+        if key == pygame.K_F3 and self.profiler:
+            self.show_overlay = not self.show_overlay
+            return
+        action = KEY_ACTIONS.get(key)
+        if action is None:
+            return
+        engine = self.engine
+        shown = (engine.state, engine.message_serial, self.message_page)
+        if not (action == ACTION_CONFIRM and engine.state == self.STATE_TEXT and self.next_page()):
+            engine.press(action)  # 続きのページがあればエンジンには送らない
+        if (engine.state, engine.message_serial, self.message_page) != shown:
+            self.restart_clock()
+    
+    def restart_clock(self):
+        """経過時間の計測をやり直す
+
+        入力で画面・メッセージ・ページが変わったとき、入力までの待ち時間（イベント駆動ループで
+        ブロックしていた間など）を開いた画面の表示時間に数えないようにする。
+        """
+        self.clock_time = None
+        self.accumulator = 0.0
+    
+    def advance_clock(self, now: float, max_ticks: Optional[int] = MAX_CATCH_UP_TICKS) -> int:
+        """壁時計の経過時間を固定刻みのティックに換算して状態を進める（戻り値は進めたティック数）
+
+        描画が遅くても（低FPSでも）ゲーム内の時間の進み方は変わらない。1回で max_ticks を
+        超える遅れ（ウィンドウのドラッグなどで止まっていた間）は追いつかずに捨てる。
+        """
+        if self.clock_time is None:
+            self.clock_time = now
+        self.accumulator += now - self.clock_time
+        self.clock_time = now
+        ticks = int(self.accumulator / TICK_SECONDS + 1e-9)  # 浮動小数の誤差で1ティック遅れないように
+        if max_ticks is not None and ticks > max_ticks:
+            ticks = max_ticks
+            self.accumulator = 0.0
         else:
-            self.state = self.STATE_ENDING
+            self.accumulator -= ticks * TICK_SECONDS
+        self.update(ticks)
+        return ticks
+    
+    def update(self, ticks: int = 1):
+        """状態更新（ticks: 進める固定刻みの数）"""
+        engine = self.engine
+        self.agent_step()
+        self.sync_message()
+        for _ in range(ticks):
+            if engine.state != self.STATE_TEXT:
+                break  # ゲーム内時計はテキスト画面の自動送りにしか使わない
+            self.message_timer += 1
+            if self.message_timer >= MESSAGE_TICKS:
+                self.message_timer = 0
+                if not self.next_page():
+                    engine.advance()
+                    self.agent_step()  # 自動送りでイベント画面になったら、続くティックの前に判断する
+                    self.sync_message()
+    
+    def agent_step(self):
+        """イベント画面ならエージェントの判断を ←/→ と決定のキー入力として送る（入力の記録に残る）"""
+        engine = self.engine
+        if self.agent is not None and engine.state == self.STATE_EVENT:
+            choice = self.agent.decide(engine.current_event, engine.phase, engine.player.hp)
+            engine.press(ACTION_LEFT if choice == 0 else ACTION_RIGHT)
+            engine.press(ACTION_CONFIRM)
+    
+    def sync_message(self):
+        """新しいメッセージが表示されたらタイマーをリセット"""
+        if self.engine.message_serial != self.message_serial:
+            self.message_serial = self.engine.message_serial
+            self.message_timer = 0
+    
+    def sync_layout(self):
+        """新しいメッセージならレイアウトし直して1ページ目に戻す（同じメッセージの間は何もしない）"""
+        engine = self.engine
+        if engine.message_serial != self.layout_serial:
+            self.layout_serial = engine.message_serial
+            self.message_pages = self.text_layout.layout(self.font_medium, engine.message, MESSAGE_WIDTH, MESSAGE_LINES)
+            self.message_page = 0
+    
+    def next_page(self) -> bool:
+        """メッセージの次のページへ（最後のページなら False）"""
+        self.sync_layout()
+        if self.message_page + 1 >= len(self.message_pages):
+            return False
+        self.message_page += 1
+        self.message_timer = 0  # ページごとに自動送りの時間を取る
+        return True
     
     def draw(self):
         """描画処理"""
-        if self.state == self.STATE_TITLE:
+        self.drawn_rects = []
+        state = self.engine.state
+        if state == self.STATE_TITLE:
             self.draw_title()
-        elif self.state == self.STATE_EVENT:
+        elif state == self.STATE_EVENT:
             self.draw_event()
-        elif self.state == self.STATE_BATTLE_ROLL:
+        elif state == self.STATE_BATTLE_ROLL:
             self.draw_battle_roll()
-        elif self.state == self.STATE_BATTLE:
+        elif state == self.STATE_BATTLE:
             self.draw_battle()
-        elif self.state == self.STATE_TEXT:
+        elif state == self.STATE_TEXT:
             self.draw_text_screen()
-        elif self.state == self.STATE_ENDING:
+        elif state == self.STATE_ENDING:
             self.draw_ending()
-        elif self.state == self.STATE_GAME_OVER:
+        elif state == self.STATE_GAME_OVER:
             self.draw_game_over()
         
         # フェーズ表示（タイトル画面以外）
-        if self.state != self.STATE_TITLE:
-            phase_text = self.font_small.render(f"フェーズ: {self.phase}/10", True, WHITE)
-            self.screen.blit(phase_text, (SCREEN_WIDTH - 160, 10))
+        if state != self.STATE_TITLE:
+            phase_text = self.render_text(
+                self.font_small, f"フェーズ: {self.engine.phase}/{self.engine.event_manager.max_phase}", WHITE)
+            # 長いキャンペーンで桁が増えても画面からはみ出さないように右端でそろえる
+            self.blit(phase_text, (min(SCREEN_WIDTH - 160, SCREEN_WIDTH - 10 - phase_text.get_width()), 10))
             
             # HP表示
-            hp_text = self.font_small.render(f"HP: {self.player.hp}/{self.player.max_hp}", True, WHITE)
-            self.screen.blit(hp_text, (10, 10))
+            hp_text = self.render_text(self.font_small, f"HP: {self.engine.player.hp}/{self.engine.player.max_hp}", WHITE)
+            self.blit(hp_text, (10, 10))
+        
+        if self.show_overlay and self.profiler:
+            self.draw_profile_overlay()
+    
+    def draw_profile_overlay(self):
+        """フレーム時間のオーバーレイ描画（HP表示の下）"""
+        profiler = self.profiler
+        # 数値は0.5秒ごとに更新し、それまでは描画済みの行を使い回す
+        if not self.overlay_lines or profiler.frames % max(1, self.fps // 2) == 0:
+            lines = [f"frame budget {profiler.budget * 1000:.1f}ms  dropped {profiler.dropped_frames}/{profiler.frames}",
+                     "          p50    p95    p99 (ms)"]
+            state_draw = f"draw.{STATE_NAMES[self.engine.state]}"
+            for section in ("events", "update", state_draw, "flip", "frame"):
+                p50, p95, p99 = profiler.percentiles(section)
+                lines.append(f"{section[:20]:20s}{p50:7.2f}{p95:7.2f}{p99:7.2f}")
+            self.overlay_lines = [self.font_tiny.render(line, True, GREEN) for line in lines]
+        
+        for i, line in enumerate(self.overlay_lines):
+            self.blit(line, (10, 40 + i * 18))
+    
+    def blit(self, surface: pygame.Surface, pos) -> pygame.Rect:
+        """画面に転送し、描いた矩形を記録する"""
+        rect = self.screen.blit(surface, pos)
+        self.drawn_rects.append(rect)
+        return rect
+    
+    def render_text(self, font: pygame.font.Font, text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+        """テキスト描画（キャッシュ経由）"""
+        return self.text_cache.render(font, text, color)
+    
+    def draw_static_screen(self, key: int, compose) -> None:
+        """内容が変わらない画面は一度だけ合成して使い回す"""
+        surface = self.static_screens.get(key)
+        if surface is None:
+            surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            surface.fill(BLACK)
+            compose(surface)
+            self.static_screens[key] = surface
+        self.blit(surface, (0, 0))
     
     def draw_title(self):
         """タイトル画面描画"""
-        title = self.font_large.render("洞窟探検RPG", True, WHITE)
-        subtitle = self.font_medium.render("- 伝説の宝を探せ -", True, WHITE)
-        phase_info = self.font_small.render("全10フェーズの冒険", True, WHITE)
-        instruction = self.font_small.render("スペースキーでスタート", True, WHITE)
-        
-        self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
-        self.screen.blit(subtitle, (SCREEN_WIDTH // 2 - subtitle.get_width() // 2, 220))
-        self.screen.blit(phase_info, (SCREEN_WIDTH // 2 - phase_info.get_width() // 2, 280))
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        self.draw_static_screen(self.STATE_TITLE, self.compose_title)
+    
+    def compose_title(self, surface: pygame.Surface):
+        """タイトル画面の合成"""
+        title = self.render_text(self.font_large, "洞窟探検RPG", WHITE)
+        subtitle = self.render_text(self.font_medium, "- 伝説の宝を探せ -", WHITE)
+        phase_info = self.render_text(self.font_small, f"全{self.engine.event_manager.max_phase}フェーズの冒険", WHITE)
+        instruction = self.render_text(self.font_small, "スペースキーでスタート", WHITE)
+        
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
+        surface.blit(subtitle, (SCREEN_WIDTH // 2 - subtitle.get_width() // 2, 220))
+        surface.blit(phase_info, (SCREEN_WIDTH // 2 - phase_info.get_width() // 2, 280))
+        surface.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_event(self):
         """イベント画面描画"""
         # イベントタイプ表示
-        event_type = self.event_manager.events[self.current_event][0]
-        event_text = self.font_medium.render(f"イベント: {event_type}", True, WHITE)
-        self.screen.blit(event_text, (SCREEN_WIDTH // 2 - event_text.get_width() // 2, 80))
+        event_type = self.engine.event_manager.events[self.engine.current_event][0]
+        event_text = self.render_text(self.font_medium, f"イベント: {event_type}", WHITE)
+        self.blit(event_text, (SCREEN_WIDTH // 2 - event_text.get_width() // 2, 80))
         
         # イベント説明表示
-        description = self.event_manager.events[self.current_event][1]
-        desc_text = self.font_small.render(description, True, WHITE)
-        self.screen.blit(desc_text, (SCREEN_WIDTH // 2 - desc_text.get_width() // 2, 150))
+        description = self.engine.event_manager.events[self.engine.current_event][1]
+        desc_text = self.render_text(self.font_small, description, WHITE)
+        self.blit(desc_text, (SCREEN_WIDTH // 2 - desc_text.get_width() // 2, 150))
         
         # イベント固有の描画
-        if self.current_event == 1:  # 道
-            left_text = self.font_small.render("<- 左へ進む", True, WHITE if self.choice == 0 else GRAY)
-            right_text = self.font_small.render("右へ進む ->", True, WHITE if self.choice == 1 else GRAY)
-            self.screen.blit(left_text, (100, 250))
-            self.screen.blit(right_text, (SCREEN_WIDTH - 100 - right_text.get_width(), 250))
+        if self.engine.current_event == EVENT_PATH:  # 道
+            left_text = self.render_text(self.font_small, "<- 左へ進む", WHITE if self.engine.choice == 0 else GRAY)
+            right_text = self.render_text(self.font_small, "右へ進む ->", WHITE if self.engine.choice == 1 else GRAY)
+            self.blit(left_text, (100, 250))
+            self.blit(right_text, (SCREEN_WIDTH - 100 - right_text.get_width(), 250))
             
-            instruction = self.font_small.render("<- -> で選択、スペースで決定", True, WHITE)
-            self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
-        
-        elif self.current_event == 4:  # 水場
-            drink_text = self.font_small.render("<- 飲む", True, WHITE if self.choice == 0 else GRAY)
-            ignore_text = self.font_small.render("飲まない ->", True, WHITE if self.choice == 1 else GRAY)
-            self.screen.blit(drink_text, (100, 250))
-            self.screen.blit(ignore_text, (SCREEN_WIDTH - 100 - ignore_text.get_width(), 250))
+            instruction = self.render_text(self.font_small, "<- -> で選択、スペースで決定", WHITE)
+            self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        
+        elif self.engine.current_event == EVENT_WATER:  # 水場
+            drink_text = self.render_text(self.font_small, "<- 飲む", WHITE if self.engine.choice == 0 else GRAY)
+            ignore_text = self.render_text(self.font_small, "飲まない ->", WHITE if self.engine.choice == 1 else GRAY)
+            self.blit(drink_text, (100, 250))
+            self.blit(ignore_text, (SCREEN_WIDTH - 100 - ignore_text.get_width(), 250))
             
-            instruction = self.font_small.render("<- -> で選択、スペースで決定", True, WHITE)
-            self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
-        
-        elif self.current_event == 5:  # 宝箱
-            open_text = self.font_small.render("<- 開ける", True, WHITE if self.choice == 0 else GRAY)
-            leave_text = self.font_small.render("開けない ->", True, WHITE if self.choice == 1 else GRAY)
-            self.screen.blit(open_text, (100, 250))
-            self.screen.blit(leave_text, (SCREEN_WIDTH - 100 - leave_text.get_width(), 250))
+            instruction = self.render_text(self.font_small, "<- -> で選択、スペースで決定", WHITE)
+            self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        
+        elif self.engine.current_event == EVENT_CHEST:  # 宝箱
+            open_text = self.render_text(self.font_small, "<- 開ける", WHITE if self.engine.choice == 0 else GRAY)
+            leave_text = self.render_text(self.font_small, "開けない ->", WHITE if self.engine.choice == 1 else GRAY)
+            self.blit(open_text, (100, 250))
+            self.blit(leave_text, (SCREEN_WIDTH - 100 - leave_text.get_width(), 250))
             
-            instruction = self.font_small.render("<- -> で選択、スペースで決定", True, WHITE)
-            self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+            instruction = self.render_text(self.font_small, "<- -> で選択、スペースで決定", WHITE)
+            self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
         
         else:  # その他のイベント
-            instruction = self.font_small.render("スペースキーで続ける", True, WHITE)
-            self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+            instruction = self.render_text(self.font_small, "スペースキーで続ける", WHITE)
+            self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_battle_roll(self):
         """戦闘開始画面描画"""
         # 敵の名前表示
-        enemy_text = self.font_medium.render(f"敵: {self.current_enemy.name}", True, RED)
-        self.screen.blit(enemy_text, (SCREEN_WIDTH // 2 - enemy_text.get_width() // 2, 80))
+        enemy_text = self.render_text(self.font_medium, f"敵: {self.engine.current_enemy.name}", RED)
+        self.blit(enemy_text, (SCREEN_WIDTH // 2 - enemy_text.get_width() // 2, 80))
         
         # 戦闘説明
-        battle_text = self.font_small.render(f"{self.current_enemy.name}が現れた！", True, WHITE)
-        self.screen.blit(battle_text, (SCREEN_WIDTH // 2 - battle_text.get_width() // 2, 150))
+        battle_text = self.render_text(self.font_small, f"{self.engine.current_enemy.name}が現れた！", WHITE)
+        self.blit(battle_text, (SCREEN_WIDTH // 2 - battle_text.get_width() // 2, 150))
         
         # 目標値表示
-        target_text = self.font_small.render(f"ダイスを振れ！目標値：{self.current_enemy.target}以下", True, WHITE)
-        self.screen.blit(target_text, (SCREEN_WIDTH // 2 - target_text.get_width() // 2, 200))
+        target_text = self.render_text(self.font_small, f"ダイスを振れ！目標値：{self.engine.current_enemy.target}以下", WHITE)
+        self.blit(target_text, (SCREEN_WIDTH // 2 - target_text.get_width() // 2, 200))
         
         # 指示表示
-        instruction = self.font_small.render("スペースキーでダイスを振る", True, WHITE)
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        instruction = self.render_text(self.font_small, "スペースキーでダイスを振る", WHITE)
+        self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_battle(self):
         """戦闘結果画面描画"""
         # 敵の名前表示
-        enemy_text = self.font_medium.render(f"敵: {self.current_enemy.name}", True, RED)
-        self.screen.blit(enemy_text, (SCREEN_WIDTH // 2 - enemy_text.get_width() // 2, 80))
+        enemy_text = self.render_text(self.font_medium, f"敵: {self.engine.current_enemy.name}", RED)
+        self.blit(enemy_text, (SCREEN_WIDTH // 2 - enemy_text.get_width() // 2, 80))
         
         # ダイスの結果表示
-        dice_text = self.font_large.render(f"ダイス: {self.dice_result}", True, WHITE)
-        self.screen.blit(dice_text, (SCREEN_WIDTH // 2 - dice_text.get_width() // 2, 180))
+        dice_text = self.render_text(self.font_large, f"ダイス: {self.engine.dice_result}", WHITE)
+        self.blit(dice_text, (SCREEN_WIDTH // 2 - dice_text.get_width() // 2, 180))
         
         # 戦闘結果表示
-        result_color = GREEN if self.battle_result else RED
-        result_text = self.font_medium.render(
-            f"{'勝利！' if self.battle_result else '敗北...'} (目標値: {self.current_enemy.target})",
-            True, result_color
+        result_color = GREEN if self.engine.battle_result else RED
+        result_text = self.render_text(
+            self.font_medium,
+            f"{'勝利！' if self.engine.battle_result else '敗北...'} (目標値: {self.engine.current_enemy.target})",
+            result_color
         )
-        self.screen.blit(result_text, (SCREEN_WIDTH // 2 - result_text.get_width() // 2, 250))
+        self.blit(result_text, (SCREEN_WIDTH // 2 - result_text.get_width() // 2, 250))
         
         # 指示表示
-        instruction = self.font_small.render("スペースキーで続ける", True, WHITE)
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        instruction = self.render_text(self.font_small, "スペースキーで続ける", WHITE)
+        self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_text_screen(self):
         """テキスト画面描画"""
-        # メッセージ表示（改行対応）
-        lines = self.message.split('\n')
+        # メッセージ表示（幅で折り返し、入りきらなければページ送り）
+        self.sync_layout()
+        lines = self.message_pages[self.message_page]
+        last_page = self.message_page + 1 == len(self.message_pages)
         y_pos = 180
         
         for i, line in enumerate(lines):
-            message_text = self.font_medium.render(line, True, WHITE)
-            self.screen.blit(message_text, (SCREEN_WIDTH // 2 - message_text.get_width() // 2, y_pos + i * 40))
+            message_text = self.render_text(self.font_medium, line, WHITE)
+            self.blit(message_text, (SCREEN_WIDTH // 2 - message_text.get_width() // 2, y_pos + i * 40))
         
-        # サブメッセージ表示（あれば）
-        if self.sub_message:
-            sub_text = self.font_small.render(self.sub_message, True, WHITE)
-            self.screen.blit(sub_text, (SCREEN_WIDTH // 2 - sub_text.get_width() // 2, y_pos + len(lines) * 40 + 10))
+        # サブメッセージ表示（あれば、最後のページだけ）
+        if self.engine.sub_message and last_page:
+            sub_text = self.render_text(self.font_small, self.engine.sub_message, WHITE)
+            self.blit(sub_text, (SCREEN_WIDTH // 2 - sub_text.get_width() // 2, y_pos + len(lines) * 40 + 10))
         
         # 指示表示
-        instruction = self.font_small.render("スペースキーで続ける", True, WHITE)
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        if last_page:
+            instruction = self.render_text(self.font_small, "スペースキーで続ける", WHITE)
+        else:
+            instruction = self.render_text(
+                self.font_small, f"スペースキーで次へ ({self.message_page + 1}/{len(self.message_pages)})", WHITE)
+        self.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_ending(self):
         """エンディング画面描画"""
-        title = self.font_large.render("ゲームクリア！", True, GREEN)
-        message1 = self.font_medium.render("伝説の宝を見つけた！", True, WHITE)
-        message2 = self.font_medium.render("あなたは英雄として称えられるだろう...", True, WHITE)
-        instruction = self.font_small.render("スペースキーでタイトルに戻る", True, WHITE)
-        
-        self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
-        self.screen.blit(message1, (SCREEN_WIDTH // 2 - message1.get_width() // 2, 220))
-        self.screen.blit(message2, (SCREEN_WIDTH // 2 - message2.get_width() // 2, 270))
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+        self.draw_static_screen(self.STATE_ENDING, self.compose_ending)
+    
+    def compose_ending(self, surface: pygame.Surface):
+        """エンディング画面の合成"""
+        title = self.render_text(self.font_large, "ゲームクリア！", GREEN)
+        message1 = self.render_text(self.font_medium, "伝説の宝を見つけた！", WHITE)
+        message2 = self.render_text(self.font_medium, "あなたは英雄として称えられるだろう...", WHITE)
+        instruction = self.render_text(self.font_small, "スペースキーでタイトルに戻る", WHITE)
+        
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
+        surface.blit(message1, (SCREEN_WIDTH // 2 - message1.get_width() // 2, 220))
+        surface.blit(message2, (SCREEN_WIDTH // 2 - message2.get_width() // 2, 270))
+        surface.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
     
     def draw_game_over(self):
         """ゲームオーバー画面描画"""
-        title = self.font_large.render("ゲームオーバー", True, RED)
-        message = self.font_medium.render("あなたは闇の中に消えた...", True, WHITE)
-        instruction = self.font_small.render("スペースキーでタイトルに戻る", True, WHITE)
-        
-        self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
-        self.screen.blit(message, (SCREEN_WIDTH // 2 - message.get_width() // 2, 220))
-        self.screen.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
-    
-    def start_game(self):
-        """ゲーム開始"""
-        self.state = self.STATE_EVENT
-        self.player = Player()
-        self.phase = 1
-        self.next_event()
-    
-    def next_event(self):
-        """次のイベント設定"""
-        self.current_event = self.event_manager.get_event(self.phase)
-        self.choice = 0  # 選択リセット
-        
-        if self.current_event == 2:  # 戦闘イベント
-            self.start_battle()
-        elif self.current_event == 3:  # 休憩イベント
-            self.show_message("静かな場所で休憩した。何も起こらない。")
-        elif self.current_event == 4:  # 水場イベント
-            self.state = self.STATE_EVENT
-        elif self.current_event == 5:  # 宝箱イベント
-            self.state = self.STATE_EVENT
-        else:
-            self.state = self.STATE_EVENT
-    
-    def start_battle(self):
-        """戦闘開始"""
-        self.current_enemy = self.event_manager.get_enemy(self.phase)
-        self.battle_continue = False  # 戦闘継続フラグをリセット
-        self.state = self.STATE_BATTLE_ROLL
-    
-    def roll_dice(self):
-        """ダイスロール実行"""
-        self.dice_result = random.randint(1, 10)
-        self.battle_result = self.dice_result <= self.current_enemy.target
-        
-        if not self.battle_result:
-            # 敗北時はダメージを受ける（ラスボスは3ダメージ、それ以外は1ダメージ）
-            damage = 3 if self.phase == 10 and self.current_enemy.name == "洞窟の王" else 1
-            self.player.damage(damage)
-            # HPが0になっても結果表示のため、ゲームオーバー処理は行わない
-            self.game_over_pending = not self.player.is_alive()
-        
-        self.state = self.STATE_BATTLE
-    
-    def show_message(self, message: str, sub_message: str = ""):
-        """メッセージ表示（文章の自動改行処理）"""
-        # 「。」で区切って改行する
-        if "。" in message:
-            parts = message.split("。")
-            formatted_message = ""
-            for i, part in enumerate(parts):
-                if part:  # 空文字列でない場合
-                    if i < len(parts) - 1:  # 最後の要素でなければ「。」を付ける
-                        formatted_message += part + "。\n"
-                    else:  # 最後の要素で、それが空でなければ追加
-                        formatted_message += part
-            self.message = formatted_message.rstrip('\n')  # 末尾の改行を削除
-        else:
-            self.message = message
-            
-        self.sub_message = sub_message
-        self.state = self.STATE_TEXT
-        self.message_timer = 0
+        self.draw_static_screen(self.STATE_GAME_OVER, self.compose_game_over)
     
-    def game_over(self):
-        """ゲームオーバー処理"""
-        self.state = self.STATE_GAME_OVER
+    def compose_game_over(self, surface: pygame.Surface):
+        """ゲームオーバー画面の合成"""
+        title = self.render_text(self.font_large, "ゲームオーバー", RED)
+        message = self.render_text(self.font_medium, "あなたは闇の中に消えた...", WHITE)
+        instruction = self.render_text(self.font_small, "スペースキーでタイトルに戻る", WHITE)
+        
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
+        surface.blit(message, (SCREEN_WIDTH // 2 - message.get_width() // 2, 220))
+        surface.blit(instruction, (SCREEN_WIDTH // 2 - instruction.get_width() // 2, 350))
+
+
+def measure_startup(font_path: Optional[str] = None) -> float:
+    """起動からタイトル画面の最初のフレームを表示するまでの時間（ミリ秒）"""
+    game = Game(font_path=font_path)
+    game.screen.fill(BLACK)
+    game.draw()
+    pygame.display.flip()
+    return (time.perf_counter() - LAUNCH_TIME) * 1000
 
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="洞窟探検RPG")
+    parser.add_argument("--event-driven", action="store_true",
+                        help="表示内容が変わったときだけ描き直す（待機中はCPUをほぼ使わない）")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help=f"描画のフレームレート（既定: {FPS}、下げてもゲームの時間の進み方は変わらない）")
+    parser.add_argument("--font", metavar="PATH", default=os.environ.get("MINIRPG_FONT"),
+                        help="同梱のフォントファイルを使う（システムフォントを探さない）")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="最初のタイトル画面までの時間を表示して終了する")
+    parser.add_argument("--seed", type=int, help="乱数のシード（省略時はランダム）")
+    parser.add_argument("--record", metavar="PATH", help="入力を記録して終了時に保存する")
+    parser.add_argument("--replay", metavar="PATH", nargs="+",
+                        help="記録を描画なしで再生し、記録時の結果と一致するか確認する")
+    parser.add_argument("--profile", action="store_true",
+                        help="フレーム時間を計測してオーバーレイに表示する（F3で表示切り替え）")
+    parser.add_argument("--profile-output", metavar="PATH",
+                        help="終了時にフレーム時間の集計をJSONで保存する（--profile を含む）")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="プレイのテレメトリをファイルに追記する（集計は python telemetry.py analyze）")
+    parser.add_argument("--agent", choices=("optimal", "always", "never"),
+                        help="水場・宝箱の判断をエージェントに任せる（最適方策 / 常にする / 常にしない）")
+    parser.add_argument("--simulate", metavar="N", type=int,
+                        help="画面を開かずにNランをシミュレーションして統計を表示する")
+    parser.add_argument("--jobs", metavar="K", type=int,
+                        help="--simulate の並列プロセス数（省略時はCPU数）")
+    parser.add_argument("--campaign", metavar="LENGTH", type=int,
+                        help="フェーズ数 LENGTH の長いキャンペーンを遊ぶ（内容はシードから生成）")
+    parser.add_argument("--campaign-seed", type=int, default=0, help="キャンペーンの生成シード")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="画面を開かずにマルチセッション・サーバーとして起動する")
+    args = parser.parse_args()
+    
+    if args.fps < 1:
+        parser.error("--fps は1以上")
+    
+    if args.campaign and args.record:
+        parser.error("--record は --campaign と同時に使えない（記録にはキャンペーンの情報が入らない）")
+    
+    event_manager = None
+    if args.campaign:
+        from campaign import Campaign
+        event_manager = Campaign(args.campaign, args.campaign_seed)
+    
+    if args.serve:
+        from server import serve, DEFAULT_HOST
+        host, _, port = args.serve.rpartition(":")
+        serve(host or DEFAULT_HOST, int(port), seed=args.seed, event_manager=event_manager)
+        sys.exit()
+    
+    if args.simulate is not None:
+        from simulate import simulate, format_stats
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+        print(format_stats(simulate(args.simulate, jobs=args.jobs, seed=seed, event_manager=event_manager)))
+        sys.exit()
+    
+    if args.startup_time:
+        print(f"startup: {measure_startup(args.font):.1f} ms")
+        pygame.quit()
+        sys.exit()
+    
+    if args.replay:
+        from replay import check
+        mismatches = check(args.replay)
+        for path, expected, actual in mismatches:
+            print(f"{path}: 記録時 {expected} / 再生結果 {actual}")
+        print(f"{len(args.replay)}件中 {len(mismatches)}件が不一致")
+        sys.exit(1 if mismatches else 0)
+    
+    engine = GameEngine(event_manager, seed=args.seed, record=bool(args.record))
+    if args.telemetry:
+        from telemetry import TelemetrySink
+        engine.telemetry = TelemetrySink(args.telemetry)
+    agent = None
+    if args.agent:
+        from agent import Policy, PolicyAgent, optimal_policy
+        if args.agent == "optimal":
+            policy = optimal_policy(engine.event_manager, exact=False)[0]
+        else:
+            policy = Policy.fixed(args.agent == "always", args.agent == "always", engine.event_manager.max_phase)
+        agent = PolicyAgent(policy)
+    game = Game(engine, font_path=args.font,
+                profile=args.profile or bool(args.profile_output), fps=args.fps, agent=agent)
+    try:
+        game.run(event_driven=args.event_driven)
+    finally:
+        if args.telemetry:
+            engine.telemetry.close()
+        if args.profile_output:
+            game.profiler.export(args.profile_output)
+        if args.record:
+            from replay import Recording
+            Recording.from_engine(game.engine).save(args.record)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""フレーム時間プロファイラ
+
+メインループの区間（イベント処理・update・画面ごとのdraw・display.flip）ごとに
+直近のフレーム時間を保持し、p50/p95/p99 を計算する。目標FPSに対して
+落ちたフレーム数も数える。描画は行わない（オーバーレイは Game 側で描く）。
+"""
+import json
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+PROFILE_WINDOW = 600  # 百分位数を計算する直近フレーム数（60FPSで10秒）
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """ソート済みの値の百分位数（最近傍法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    """フレーム時間プロファイラ"""
+    def __init__(self, fps: int, window: int = PROFILE_WINDOW):
+        self.fps = fps
+        self.budget = 1.0 / fps  # 1フレームの持ち時間（秒）
+        self.window = window
+        self.sections: Dict[str, Deque[float]] = {}
+        self.frames = 0
+        self.dropped_frames = 0
+        self.last_frame_start = None
+
+    def record(self, section: str, seconds: float) -> None:
+        """区間の時間を記録"""
+        samples = self.sections.get(section)
+        if samples is None:
+            samples = self.sections[section] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def record_frame(self, state_name: str, frame_start: float, events: float,
+                     update: float, draw: float, flip: float) -> None:
+        """1フレーム分の区間時間を記録する（draw は画面ごとに分けて記録）"""
+        self.record("events", events)
+        self.record("update", update)
+        self.record("draw", draw)
+        self.record(f"draw.{state_name}", draw)
+        self.record("flip", flip)
+        self.record("work", events + update + draw + flip)
+
+        # 前フレームの開始からの間隔で、間に合わなかったフレーム数を数える
+        if self.last_frame_start is not None:
+            interval = frame_start - self.last_frame_start
+            self.record("frame", interval)
+            missed = int(interval / self.budget + 0.5) - 1
+            if missed > 0:
+                self.dropped_frames += missed
+        self.last_frame_start = frame_start
+        self.frames += 1
+
+    def percentiles(self, section: str) -> Tuple[float, float, float]:
+        """区間の (p50, p95, p99)（ミリ秒）"""
+        values = sorted(self.sections.get(section, ()))
+        return tuple(percentile(values, q) * 1000 for q in (50, 95, 99))
+
+    def summary(self) -> Dict[str, object]:
+        """全区間の集計"""
+        return {
+            "fps_target": self.fps,
+            "budget_ms": self.budget * 1000,
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "sections": {
+                name: dict(zip(("p50_ms", "p95_ms", "p99_ms"), self.percentiles(name)), samples=len(samples))
+                for name, samples in sorted(self.sections.items())
+            },
+        }
+
+    def export(self, path: str) -> None:
+        """集計をJSONで保存"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
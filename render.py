@@ -0,0 +1,190 @@
+"""オフスクリーン描画
+
+ウィンドウを開かず、フレーム待ちもせずに Game.draw をメモリ上のサーフェスに描く。
+フレームはNumPy配列（コピーなしのビュー）として取り出すか、PNGの連番や
+動画（ffmpeg）として書き出せる。画面ごとのゴールデンイメージとの比較もできる。
+
+    python render.py replay play.mrpg --png frames/          # 記録を連番PNGに
+    python render.py replay play.mrpg --video play.mp4 --hold 30
+    python render.py golden golden/ --update                 # ゴールデンイメージを作る
+    python render.py golden golden/                          # 比較（違いがあれば終了コード1）
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pygame
+
+from engine import EVENT_PATH, EVENT_WATER, ACTION_ADVANCE, MSG_WATER_GOOD, GameEngine
+from miniRPG import Game, BLACK, STATE_NAMES, SCREEN_WIDTH, SCREEN_HEIGHT
+from replay import Recording
+
+
+def prepare_state(game: Game, state: int) -> None:
+    """各画面を描ける状態にエンジンを設定する"""
+    engine = game.engine
+    engine.start_game()
+    engine.phase = 5
+    engine.current_event = EVENT_WATER if state == Game.STATE_EVENT else EVENT_PATH
+    engine.current_enemy = engine.event_manager.get_enemy(5, random.Random(0))  # ゴールデンイメージ用に毎回同じ敵
+    engine.dice_result = 4
+    engine.battle_result = True
+    engine.show_message(MSG_WATER_GOOD, show_hp=True)
+    engine.state = state
+    game.update()
+
+
+class OffscreenRenderer:
+    """Game をオフスクリーンで描くレンダラー"""
+    def __init__(self, engine: Optional[GameEngine] = None, font_path: Optional[str] = None):
+        self.game = Game(engine, font_path=font_path, offscreen=True)
+        self.frames = 0
+
+    @property
+    def surface(self) -> pygame.Surface:
+        return self.game.screen
+
+    def render(self) -> pygame.Surface:
+        """現在の状態を1フレーム描く（戻り値は毎回同じサーフェス）"""
+        self.surface.fill(BLACK)
+        self.game.draw()
+        self.frames += 1
+        return self.surface
+
+    def pixels(self):
+        """描いたフレームの (高さ, 幅, RGB) のNumPy配列（コピーしないビュー）
+
+        ビューがある間サーフェスはロックされるので、次の render の前に参照を捨てること。
+        """
+        return pygame.surfarray.pixels3d(self.surface).transpose(1, 0, 2)
+
+    def replay(self, recording: Recording, hold: int = 1) -> Iterator[pygame.Surface]:
+        """記録を再生しながら、入力ごとに hold フレームずつ描く"""
+        engine = GameEngine(self.game.engine.event_manager, seed=recording.seed)
+        self.game.engine = engine
+        self.game.message_serial = engine.message_serial
+        self.render()
+        for _ in range(hold):
+            yield self.surface
+        for action in recording.inputs:
+            if action == ACTION_ADVANCE:
+                engine.advance()
+            else:
+                engine.press(action)
+            self.render()
+            for _ in range(hold):
+                yield self.surface
+
+    def screens(self) -> Iterator[Tuple[str, pygame.Surface]]:
+        """すべての画面を1枚ずつ描く（画面名, サーフェス）"""
+        for state, name in sorted(STATE_NAMES.items()):
+            prepare_state(self.game, state)
+            yield name, self.render()
+
+
+def save_png_sequence(frames: Iterable[pygame.Surface], directory: str, prefix: str = "frame") -> int:
+    """フレームを directory/prefix_000000.png の連番で保存し、枚数を返す"""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for surface in frames:
+        pygame.image.save(surface, os.path.join(directory, f"{prefix}_{count:06d}.png"))
+        count += 1
+    return count
+
+
+def write_video(frames: Iterable[pygame.Surface], path: str, fps: int = 30) -> int:
+    """フレームを ffmpeg で動画にし、枚数を返す"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("動画の書き出しには ffmpeg が必要")
+    process = subprocess.Popen(
+        [ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+         "-s", f"{SCREEN_WIDTH}x{SCREEN_HEIGHT}", "-r", str(fps), "-i", "-",
+         "-pix_fmt", "yuv420p", path],
+        stdin=subprocess.PIPE,
+    )
+    count = 0
+    try:
+        for surface in frames:
+            process.stdin.write(pygame.image.tobytes(surface, "RGB"))
+            count += 1
+    finally:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg が失敗した（終了コード {process.returncode}）")
+    return count
+
+
+def compare_golden(renderer: OffscreenRenderer, directory: str, update: bool = False) -> List[str]:
+    """画面ごとにゴールデンイメージ（directory/画面名.png）と比べ、違う画面の名前を返す
+
+    update=True ならゴールデンイメージを書き直す。
+    """
+    os.makedirs(directory, exist_ok=True)
+    mismatches = []
+    for name, surface in renderer.screens():
+        path = os.path.join(directory, f"{name}.png")
+        if update:
+            pygame.image.save(surface, path)
+            continue
+        if not os.path.exists(path):
+            mismatches.append(name)
+            continue
+        golden = pygame.image.load(path)
+        if golden.get_size() != surface.get_size() or \
+                pygame.image.tobytes(golden, "RGB") != pygame.image.tobytes(surface, "RGB"):
+            mismatches.append(name)
+    return mismatches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG オフスクリーン描画")
+    parser.add_argument("--font", metavar="PATH", default=os.environ.get("MINIRPG_FONT"),
+                        help="フォントファイル（ゴールデンイメージは同じフォントで比べること）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_parser = sub.add_parser("replay", help="記録を再生して描く")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--png", metavar="DIR", help="連番PNGを保存するディレクトリ")
+    replay_parser.add_argument("--video", metavar="PATH", help="動画ファイル（要ffmpeg）")
+    replay_parser.add_argument("--fps", type=int, default=30, help="動画のフレームレート")
+    replay_parser.add_argument("--hold", type=int, default=1, help="1入力あたりのフレーム数")
+    golden_parser = sub.add_parser("golden", help="画面ごとのゴールデンイメージと比べる")
+    golden_parser.add_argument("directory")
+    golden_parser.add_argument("--update", action="store_true", help="ゴールデンイメージを書き直す")
+    args = parser.parse_args()
+
+    renderer = OffscreenRenderer(font_path=args.font)
+    if args.command == "golden":
+        mismatches = compare_golden(renderer, args.directory, args.update)
+        for name in mismatches:
+            print(f"{name}: ゴールデンイメージと違う")
+        if not args.update:
+            print(f"{len(STATE_NAMES)}画面中 {len(mismatches)}画面が不一致")
+        return 1 if mismatches else 0
+
+    start = time.perf_counter()
+    frames = renderer.replay(Recording.load(args.recording), args.hold)
+    if args.video:
+        try:
+            count = write_video(frames, args.video, args.fps)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+    elif args.png:
+        count = save_png_sequence(frames, args.png)
+    else:
+        count = sum(1 for _ in frames)  # 描くだけ（速度の確認用）
+    elapsed = time.perf_counter() - start
+    print(f"{count}フレーム {elapsed:.2f}秒 ({count / elapsed if elapsed else 0:.0f} フレーム/秒)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
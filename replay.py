@@ -0,0 +1,98 @@
+"""入力の記録と再生
+
+セッションのシードと入力（ACTION_*）の列を小さなバイナリに保存し、描画や
+フレーム待ちなしで `GameEngine` に流し込んで再生する。記録時の最終結果も
+保存しておくので、再生結果と比べればリグレッションを検出できる。
+
+ファイル形式（リトルエンディアン）:
+    ヘッダ  "MRPG", バージョン(1B), シード(8B), 入力数(4B)
+    入力    1入力2ビット、1バイトに4入力
+    結果    状態(1B), フェーズ(4B), HP(1B)
+"""
+import struct
+from typing import List, Optional, Tuple, Iterable
+
+from engine import ACTION_ADVANCE, EventManager, GameEngine
+
+MAGIC = b"MRPG"
+VERSION = 1
+HEADER = struct.Struct("<4sBQI")
+FOOTER = struct.Struct("<BIB")
+
+# 再生結果: (状態, フェーズ, HP)
+Outcome = Tuple[int, int, int]
+
+
+class Recording:
+    """1セッション分の入力記録"""
+    def __init__(self, seed: int, inputs: bytes, outcome: Optional[Outcome] = None):
+        self.seed = seed
+        self.inputs = bytes(inputs)
+        self.outcome = outcome  # 記録時の最終結果
+
+    @classmethod
+    def from_engine(cls, engine: GameEngine) -> "Recording":
+        """記録モードのエンジンから作る"""
+        if engine.inputs is None or engine.streams.seed is None:
+            raise ValueError("シード付き・記録モード（record=True）のエンジンが必要")
+        return cls(engine.streams.seed, engine.inputs, outcome(engine))
+
+    def to_bytes(self) -> bytes:
+        """バイナリ形式に変換"""
+        packed = bytearray((len(self.inputs) + 3) // 4)
+        for i, action in enumerate(self.inputs):
+            packed[i >> 2] |= action << ((i & 3) * 2)
+        state, phase, hp = self.outcome or (0, 0, 0)
+        return HEADER.pack(MAGIC, VERSION, self.seed, len(self.inputs)) + bytes(packed) + FOOTER.pack(state, phase, hp)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Recording":
+        """バイナリ形式から読み込む"""
+        magic, version, seed, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("記録ファイルの形式が違う")
+        start = HEADER.size
+        end = start + (count + 3) // 4
+        packed = data[start:end]
+        inputs = bytes((packed[i >> 2] >> ((i & 3) * 2)) & 3 for i in range(count))
+        return cls(seed, inputs, FOOTER.unpack_from(data, end))
+
+    def save(self, path: str) -> None:
+        """ファイルに保存"""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        """ファイルから読み込む"""
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def outcome(engine: GameEngine) -> Outcome:
+    """エンジンの最終結果"""
+    return engine.state, engine.phase, engine.player.hp
+
+
+def replay(recording: Recording, event_manager: Optional[EventManager] = None) -> GameEngine:
+    """記録を描画・フレーム待ちなしで再生し、再生後のエンジンを返す"""
+    engine = GameEngine(event_manager, seed=recording.seed)
+    press = engine.press
+    advance = engine.advance
+    for action in recording.inputs:
+        if action == ACTION_ADVANCE:
+            advance()
+        else:
+            press(action)
+    return engine
+
+
+def check(paths: Iterable[str]) -> List[Tuple[str, Outcome, Outcome]]:
+    """記録ファイルを再生し、記録時と結果が違うもの (パス, 記録時, 再生結果) を返す"""
+    mismatches = []
+    for path in paths:
+        recording = Recording.load(path)
+        result = outcome(replay(recording))
+        if result != recording.outcome:
+            mismatches.append((path, recording.outcome, result))
+    return mismatches
@@ -0,0 +1,231 @@
+"""asyncioによるマルチセッション・ゲームサーバー
+
+1つのイベントループで多数の独立したセッション（それぞれが GameEngine を持つ）を
+動かす。クライアントはTCPで1行1つのJSONを送り、状態の更新をJSON行で受け取る。
+
+    クライアント → サーバー: {"action": "left" | "right" | "confirm"}
+    サーバー → クライアント: {"type": "state", "session": 1, "state": "event", "phase": 3, ...}
+
+接続すると新しいセッションが作られ、切断すると破棄される。テキスト画面の自動送り
+（2秒）はセッションごとのポーリングではなく、全セッション共有のタイマーホイールで扱う。
+"""
+import asyncio
+import json
+import math
+import random
+from typing import Callable, Dict, List, Optional
+
+from engine import (
+    MESSAGE_SECONDS, ACTION_LEFT, ACTION_RIGHT, ACTION_CONFIRM, CompactStreams, EventManager, GameEngine,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TIMER_RESOLUTION = 0.05  # タイマーホイールの1目盛り（秒）
+TIMER_SLOTS = 256
+
+ACTIONS = {"left": ACTION_LEFT, "right": ACTION_RIGHT, "confirm": ACTION_CONFIRM}
+STATE_NAMES = {value: name[len("STATE_"):].lower()
+               for name, value in vars(GameEngine).items() if name.startswith("STATE_")}
+
+
+class TimerWheel:
+    """ハッシュ化タイマーホイール
+
+    期限を目盛り単位に丸めてリングバッファのスロットに入れる。1周より先の期限は
+    同じスロットに入れておき、期限の目盛りが来るまで持ち越す。登録・取り消しはO(1)。
+    """
+    def __init__(self, resolution: float = TIMER_RESOLUTION, slots: int = TIMER_SLOTS):
+        self.resolution = resolution
+        self.slots: List[List[list]] = [[] for _ in range(slots)]
+        self.tick = 0  # 処理済みの目盛り
+        self.pending = 0
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        """delay 秒後に callback を呼ぶ（戻り値は cancel に渡すハンドル）"""
+        deadline = self.tick + max(1, math.ceil(delay / self.resolution))
+        handle = [deadline, callback]
+        self.slots[deadline % len(self.slots)].append(handle)
+        self.pending += 1
+        return handle
+
+    def cancel(self, handle: list) -> None:
+        """登録を取り消す（スロットからは期限が来たときに取り除く）"""
+        if handle[1] is not None:
+            handle[1] = None
+            self.pending -= 1
+
+    def advance(self, tick: int) -> None:
+        """tick 目盛りまで進め、期限が来たコールバックを呼ぶ"""
+        while self.tick < tick:
+            self.tick += 1
+            index = self.tick % len(self.slots)
+            bucket = self.slots[index]
+            if not bucket:
+                continue
+            keep = []
+            due = []
+            for handle in bucket:
+                if handle[1] is None:
+                    continue
+                (due if handle[0] <= self.tick else keep).append(handle)
+            self.slots[index] = keep
+            for handle in due:
+                callback = handle[1]
+                handle[1] = None
+                self.pending -= 1
+                callback()
+
+    async def run(self) -> None:
+        """イベントループの時計に合わせて回し続ける"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            await asyncio.sleep(self.resolution)
+            self.advance(int((loop.time() - start) / self.resolution))
+
+
+class Session:
+    """1人分のゲームセッション"""
+    __slots__ = ("session_id", "engine", "send", "wheel", "timer", "timer_serial")
+
+    def __init__(self, session_id: int, engine: GameEngine,
+                 send: Callable[[dict], None], wheel: TimerWheel):
+        self.session_id = session_id
+        self.engine = engine
+        self.send = send
+        self.wheel = wheel
+        self.timer = None
+        self.timer_serial = engine.message_serial
+
+    def press(self, action: int) -> None:
+        """入力を処理して状態を送る"""
+        self.engine.press(action)
+        self.after_change()
+
+    def on_timer(self) -> None:
+        """テキスト画面の自動送り"""
+        self.timer = None
+        if self.engine.state == GameEngine.STATE_TEXT:
+            self.engine.advance()
+            self.after_change()
+
+    def after_change(self) -> None:
+        """新しいメッセージが表示されたら自動送りのタイマーを掛け直し、状態を送る"""
+        engine = self.engine
+        if engine.message_serial != self.timer_serial or engine.state != GameEngine.STATE_TEXT:
+            if self.timer is not None:
+                self.wheel.cancel(self.timer)
+                self.timer = None
+            self.timer_serial = engine.message_serial
+            if engine.state == GameEngine.STATE_TEXT:
+                self.timer = self.wheel.schedule(MESSAGE_SECONDS, self.on_timer)
+        self.send(self.snapshot())
+
+    def close(self) -> None:
+        """タイマーを止める"""
+        if self.timer is not None:
+            self.wheel.cancel(self.timer)
+            self.timer = None
+
+    def snapshot(self) -> dict:
+        """クライアントに送る状態"""
+        engine = self.engine
+        enemy = engine.current_enemy
+        return {
+            "type": "state",
+            "session": self.session_id,
+            "state": STATE_NAMES[engine.state],
+            "phase": engine.phase,
+            "hp": engine.player.hp,
+            "max_hp": engine.player.max_hp,
+            "event": engine.current_event,
+            "choice": engine.choice,
+            "enemy": {"name": enemy.name, "target": enemy.target} if enemy else None,
+            "dice": engine.dice_result,
+            "battle_result": engine.battle_result,
+            "message": engine.message,
+            "sub_message": engine.sub_message,
+        }
+
+
+class GameServer:
+    """マルチセッション・ゲームサーバー"""
+    def __init__(self, seed: Optional[int] = None, event_manager: Optional[EventManager] = None):
+        # テーブルは全セッションで共有する（エンジンは書き換えない）
+        self.event_manager = event_manager or EventManager()
+        self.seed = seed
+        self.wheel = TimerWheel()
+        self.sessions: Dict[int, Session] = {}
+        self.next_id = 1
+
+    def create_session(self, send: Callable[[dict], None]) -> Session:
+        """新しいセッションを作る（サーバーのシードがあればセッションのシードもそこから決まる）
+
+        乱数は CompactStreams（状態はシードと引いた回数だけ）。既定の RngStreams は
+        Mersenne Twister を6つ持ち、1セッションあたり約17KBになる。
+        """
+        session_id = self.next_id
+        self.next_id += 1
+        seed = None
+        if self.seed is not None:
+            seed = random.Random(f"{self.seed}/session/{session_id}").randrange(2 ** 63)
+        engine = GameEngine(self.event_manager, streams=CompactStreams(seed))
+        session = Session(session_id, engine, send, self.wheel)
+        self.sessions[session_id] = session
+        return session
+
+    def close_session(self, session: Session) -> None:
+        """セッションを破棄する"""
+        session.close()
+        self.sessions.pop(session.session_id, None)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1接続 = 1セッション"""
+        def send(message: dict) -> None:
+            if not writer.is_closing():
+                writer.write(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+
+        session = self.create_session(send)
+        send(session.snapshot())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # 行がストリームの上限を超えた（LimitOverrunError から変換される）
+                    send({"type": "error", "error": "入力の行が長すぎる"})
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    action = ACTIONS[json.loads(line)["action"]]
+                except (ValueError, KeyError, TypeError):
+                    send({"type": "error", "error": "不正な入力", "input": line.decode(errors="replace").strip()})
+                    continue
+                session.press(action)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.close_session(session)
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """サーバーを起動して止まるまで動かす"""
+        server = await asyncio.start_server(self.handle_client, host, port, backlog=4096)
+        timer_task = asyncio.create_task(self.wheel.run())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            timer_task.cancel()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, seed: Optional[int] = None,
+          event_manager: Optional[EventManager] = None) -> None:
+    """サーバーを起動する（Ctrl+Cで終了。event_manager を渡せば長いキャンペーンを配信する）"""
+    try:
+        asyncio.run(GameServer(seed, event_manager).serve(host, port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,97 @@
+"""マルチコアの並列シミュレーション
+
+ラン数を一定サイズのブロックに分け、ブロックごとにシードから独立した乱数
+ストリームを作ってプロセスプールで実行し、統計をマージする。ブロックの分け方と
+シードはジョブ数に依存しないので、同じシードなら何並列でも結果は同じになる。
+長いキャンペーン（campaign.Campaign）は event_manager として渡す（各プロセスに複製される）。
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from engine import MAX_HP, EventManager, Simulator
+
+BLOCK_SIZE = 50_000  # 1ブロックのラン数（結果の再現性のためジョブ数とは無関係に固定）
+SUMMARY_ROWS = 20  # 表示するフェーズの行数の上限（これより長いランはフェーズをまとめて表示する）
+
+
+def block_seed(seed: int, block: int) -> int:
+    """ブロック番号から、そのブロック専用のシードを作る"""
+    return random.Random(f"{seed}/block/{block}").randrange(2 ** 63)
+
+
+def _run_block(args) -> Dict[str, object]:
+    """1ブロック分のランを実行する（ワーカープロセスで呼ばれる）"""
+    seed, block, runs, drink, open_chest, event_manager = args
+    simulator = Simulator(event_manager, seed=block_seed(seed, block), drink=drink, open_chest=open_chest)
+    return simulator.run(runs)
+
+
+def merge_stats(results: List[Dict[str, object]]) -> Dict[str, object]:
+    """Simulator.run の結果をまとめる"""
+    runs = sum(r["runs"] for r in results)
+    wins = sum(r["wins"] for r in results)
+    death_phases = [0] * max(len(r["death_phases"]) for r in results)
+    end_hp = [0] * (MAX_HP + 1)
+    for r in results:
+        for phase, count in enumerate(r["death_phases"]):
+            death_phases[phase] += count
+        for hp, count in enumerate(r["end_hp"]):
+            end_hp[hp] += count
+    return {
+        "runs": runs,
+        "wins": wins,
+        "clear_rate": wins / runs if runs else 0.0,
+        "death_phases": death_phases,
+        "end_hp": end_hp,
+    }
+
+
+def reached_phases(stats: Dict[str, object]) -> List[int]:
+    """各フェーズに到達したラン数（インデックス = フェーズ）"""
+    reached = [0] * len(stats["death_phases"])
+    remaining = stats["runs"]
+    for phase in range(1, len(reached)):
+        reached[phase] = remaining
+        remaining -= stats["death_phases"][phase]
+    return reached
+
+
+def simulate(runs: int, jobs: Optional[int] = None, seed: int = 0,
+             drink: bool = True, open_chest: bool = True,
+             block_size: int = BLOCK_SIZE, event_manager: Optional[EventManager] = None) -> Dict[str, object]:
+    """runs 回のランを jobs プロセスで実行して集計する（jobs=None ならCPU数）"""
+    event_manager = event_manager or EventManager()
+    tasks = []
+    for block, start in enumerate(range(0, runs, block_size)):
+        tasks.append((seed, block, min(block_size, runs - start), drink, open_chest, event_manager))
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        results = [_run_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_run_block, tasks))
+    stats = merge_stats(results)
+    stats["seed"] = seed
+    stats["reached_phases"] = reached_phases(stats)
+    return stats
+
+
+def format_stats(stats: Dict[str, object]) -> str:
+    """集計結果を表示用の文字列にする"""
+    runs = stats["runs"] or 1
+    lines = [
+        f"シード: {stats['seed']}  ラン数: {stats['runs']}",
+        f"クリア: {stats['wins']} ({stats['wins'] / runs:.4%})  ゲームオーバー: {stats['runs'] - stats['wins']}",
+    ]
+    max_phase = len(stats["death_phases"]) - 1
+    size = -(-max_phase // SUMMARY_ROWS)  # 1行にまとめるフェーズ数
+    for first in range(1, max_phase + 1, size):
+        last = min(first + size - 1, max_phase)
+        label = f"フェーズ{first:2d}" if first == last else f"フェーズ{first}-{last}"
+        deaths = sum(stats["death_phases"][first:last + 1])
+        lines.append(f"{label}  到達 {stats['reached_phases'][first]:>10}  死亡 {deaths:>10}")
+    lines.append("クリア時HP: " + "  ".join(f"HP{hp}={stats['end_hp'][hp]}" for hp in range(1, MAX_HP + 1)))
+    return "\n".join(lines)
@@ -0,0 +1,139 @@
+"""セッション状態の固定長バイナリスナップショット
+
+GameEngine の状態を1セッションあたり固定長（RECORD.size バイト）のレコードに詰める。
+乱数は CompactStreams（シードと引いた回数だけが状態）を使ったエンジンに限る。
+SessionBuffer は多数のセッションのレコードを1つの bytearray に並べて持ち、
+memoryview で切り出すのでコピーせずに保存・送信できる。
+
+    streams = CompactStreams(seed)
+    engine = GameEngine(streams=streams)
+    buffer = SessionBuffer(10000)
+    buffer.save(0, engine)
+    restored = buffer.load(0)
+"""
+import struct
+from typing import Optional
+
+from engine import BOSS_NAME, CompactStreams, Enemy, EventManager, GameEngine
+
+NO_EVENT = 0
+NO_ENEMY = 255
+NO_HP = 255  # message_hp が None
+BOSS_ENEMY = 254  # enemies にないボス（既定の目標値のボス）
+
+FLAG_BATTLE_RESULT = 1
+FLAG_BATTLE_CONTINUE = 2
+FLAG_BATTLE_SETTLED = 4
+FLAG_GAME_OVER_PENDING = 8
+
+# state, phase, hp, max_hp, event, choice, dice, flags, enemy, enemy_target,
+# message_id, message_arg, message_hp, message_serial, seed, counters x6
+RECORD = struct.Struct("<BHBBBBBBBBBBBIQ6I")
+
+
+def pack_into(buffer, offset: int, engine: GameEngine) -> None:
+    """エンジンの状態を buffer[offset:offset + RECORD.size] に書き込む"""
+    streams = engine.streams
+    if not isinstance(streams, CompactStreams):
+        raise ValueError("スナップショットには CompactStreams を使ったエンジンが必要")
+
+    flags = ((FLAG_BATTLE_RESULT if engine.battle_result else 0)
+             | (FLAG_BATTLE_CONTINUE if engine.battle_continue else 0)
+             | (FLAG_BATTLE_SETTLED if engine.battle_settled else 0)
+             | (FLAG_GAME_OVER_PENDING if engine.game_over_pending else 0))
+
+    enemy = engine.current_enemy
+    if enemy is None:
+        enemy_code, enemy_target = NO_ENEMY, 0
+    elif enemy.enemy_id is not None:
+        enemy_code, enemy_target = enemy.enemy_id, enemy.target
+    elif enemy.name == BOSS_NAME:
+        enemy_code, enemy_target = BOSS_ENEMY, enemy.target
+    else:
+        raise ValueError(f"敵IDのない敵は保存できない: {enemy.name}")
+
+    message_hp = NO_HP if engine.message_hp is None else engine.message_hp
+    RECORD.pack_into(
+        buffer, offset,
+        engine.state, engine.phase, engine.player.hp, engine.player.max_hp,
+        engine.current_event or NO_EVENT, engine.choice, engine.dice_result, flags,
+        enemy_code, enemy_target, engine.message_id, engine.message_arg, message_hp,
+        engine.message_serial, streams.seed, *streams.counters(),
+    )
+
+
+def unpack_from(buffer, offset: int = 0, event_manager: Optional[EventManager] = None,
+                engine: Optional[GameEngine] = None) -> GameEngine:
+    """buffer[offset:] のレコードからエンジンを復元する（engine を渡すとそれを上書きする）"""
+    (state, phase, hp, max_hp, event, choice, dice, flags, enemy_code, enemy_target,
+     message_id, message_arg, message_hp, message_serial, seed, *counters) = RECORD.unpack_from(buffer, offset)
+
+    if engine is None:
+        engine = GameEngine(event_manager, streams=CompactStreams(seed, counters))
+    else:
+        engine.streams = CompactStreams(seed, counters)
+    engine.state = state
+    engine.phase = phase
+    engine.player.hp = hp
+    engine.player.max_hp = max_hp
+    engine.current_event = event or None
+    engine.choice = choice
+    engine.dice_result = dice
+    engine.battle_result = bool(flags & FLAG_BATTLE_RESULT)
+    engine.battle_continue = bool(flags & FLAG_BATTLE_CONTINUE)
+    engine.battle_settled = bool(flags & FLAG_BATTLE_SETTLED)
+    engine.game_over_pending = bool(flags & FLAG_GAME_OVER_PENDING)
+
+    if enemy_code == NO_ENEMY:
+        engine.current_enemy = None
+    elif enemy_code == BOSS_ENEMY:
+        engine.current_enemy = Enemy(BOSS_NAME, enemy_target)
+    else:
+        name = engine.event_manager.enemies[enemy_code][0]
+        engine.current_enemy = Enemy(name, enemy_target, enemy_code)
+
+    engine.message_id = message_id
+    engine.message_arg = message_arg
+    engine.message_hp = None if message_hp == NO_HP else message_hp
+    engine.message_serial = message_serial
+    engine.render_message()
+    return engine
+
+
+def snapshot(engine: GameEngine) -> bytes:
+    """1セッション分のスナップショット"""
+    buffer = bytearray(RECORD.size)
+    pack_into(buffer, 0, engine)
+    return bytes(buffer)
+
+
+def restore(data, event_manager: Optional[EventManager] = None) -> GameEngine:
+    """snapshot の結果からエンジンを復元する"""
+    return unpack_from(data, 0, event_manager)
+
+
+class SessionBuffer:
+    """多数のセッションのスナップショットを並べた連続バッファ"""
+    def __init__(self, capacity: int, event_manager: Optional[EventManager] = None):
+        self.capacity = capacity
+        self.event_manager = event_manager or EventManager()
+        self.data = bytearray(RECORD.size * capacity)
+        self.view = memoryview(self.data)
+
+    def save(self, index: int, engine: GameEngine) -> None:
+        """index 番目のスロットに保存"""
+        pack_into(self.data, self._offset(index), engine)
+
+    def load(self, index: int, engine: Optional[GameEngine] = None) -> GameEngine:
+        """index 番目のスロットから復元"""
+        return unpack_from(self.data, self._offset(index), self.event_manager, engine)
+
+    def record(self, index: int) -> memoryview:
+        """index 番目のレコード（コピーしない）"""
+        offset = self._offset(index)
+        return self.view[offset:offset + RECORD.size]
+
+    def _offset(self, index: int) -> int:
+        if not 0 <= index < self.capacity:
+            raise IndexError(index)
+        return index * RECORD.size
@@ -0,0 +1,195 @@
+"""(フェーズ, HP) 上の動的計画法による厳密解
+
+ゲームはフェーズ1-10・HP0-3の小さなマルコフ連鎖なので、サンプリングせずに
+クリア確率・死亡フェーズの分布・クリア時HPの分布を厳密に求められる。
+ルールは `engine.GameEngine` / `engine.Simulator` と同じ。
+長いキャンペーン（campaign.Campaign）も解けるが、有理数は桁が膨らむので exact=False で使う。
+"""
+from fractions import Fraction
+from typing import List, Dict, Optional, Iterable
+
+from engine import (
+    MAX_HP, BOSS_NAME, BOSS_DAMAGE, HEAL_CHANCE, WATER_HEAL_CHANCE,
+    EVENT_BATTLE, EVENT_WATER, EVENT_CHEST, EventManager,
+)
+
+# 遷移行列: kernel[h][h2] は HP h でフェーズを始めて HP h2 で終える確率（h2 == 0 は死亡）
+Kernel = List[List[object]]
+
+
+class OutcomeSolver:
+    """厳密解ソルバー
+
+    フェーズごとの遷移行列と各フェーズ開始時のHP分布をキャッシュしておき、
+    重みや目標値を1つ変えたときは影響するフェーズから先だけを解き直す。
+    """
+    def __init__(self, event_manager: Optional[EventManager] = None,
+                 drink: bool = True, open_chest: bool = True, exact: bool = True):
+        self.event_manager = event_manager or EventManager()
+        self.drink = drink
+        self.open_chest = open_chest
+        # exact=True なら有理数（Fraction）、False なら浮動小数で計算する
+        self.number = (lambda x: Fraction(str(x))) if exact else float
+        self._kernels: Dict[int, Kernel] = {}
+        self._battle_kernels: Dict[tuple, Kernel] = {}
+        self._dists: Dict[int, List[object]] = {}
+        self._deaths: Dict[int, object] = {}
+        self._dirty_from = 1
+
+    def set_event_weight(self, event_id: int, weight: int, late: bool = False) -> None:
+        """イベントの重みを変更（late=True なら終盤の重み）"""
+        em = self.event_manager
+        kind, description, early, late_weight = em.events[event_id]
+        if late:
+            em.events[event_id] = (kind, description, early, weight)
+        else:
+            em.events[event_id] = (kind, description, weight, late_weight)
+        self.invalidate(em.event_weight_phases(late))
+        em.compile()
+
+    def set_enemy_target(self, name: str, target: int) -> None:
+        """敵の目標値を変更"""
+        em = self.event_manager
+        for i, (enemy_name, _, min_phase, max_phase) in enumerate(em.enemies):
+            if enemy_name == name:
+                em.enemies[i] = (enemy_name, target, min_phase, max_phase)
+                self.invalidate(em.enemy_phases(i))
+                # ボスの目標値は最終フェーズで使われる
+                if name == BOSS_NAME:
+                    self.invalidate([em.max_phase])
+                em.compile()
+                return
+        raise KeyError(name)
+
+    def invalidate(self, phases: Optional[Iterable[int]] = None) -> None:
+        """指定フェーズ（省略時は全フェーズ）のキャッシュを破棄する
+
+        event_manager のテーブルを直接書き換えた場合はこれを呼ぶ。
+        """
+        phases = list(range(1, self.event_manager.max_phase + 1) if phases is None else phases)
+        for phase in phases:
+            self._kernels.pop(phase, None)
+        if phases:
+            self._dirty_from = min(self._dirty_from, min(phases))
+
+    def solve(self) -> Dict[str, object]:
+        """クリア確率・死亡フェーズ分布・クリア時HP分布を求める
+
+        death_phases[p] はフェーズpで死亡する確率、end_hp[h] はHP hでクリアする確率。
+        """
+        zero, one = self.number(0), self.number(1)
+        max_phase = self.event_manager.max_phase
+        if 1 not in self._dists:
+            self._dists[1] = [zero] * MAX_HP + [one]
+
+        # 変更のあったフェーズから先だけ前向きに解き直す
+        for phase in range(self._dirty_from, max_phase + 1):
+            kernel = self._kernels.get(phase)
+            if kernel is None:
+                kernel = self._kernels[phase] = self.phase_kernel(phase)
+            dist = self._dists[phase]
+            next_dist = [zero] * (MAX_HP + 1)
+            for h in range(1, MAX_HP + 1):
+                if dist[h]:
+                    for h2 in range(MAX_HP + 1):
+                        next_dist[h2] += dist[h] * kernel[h][h2]
+            self._deaths[phase] = next_dist[0]
+            next_dist[0] = zero
+            self._dists[phase + 1] = next_dist
+        self._dirty_from = max_phase + 1
+
+        end_hp = self._dists[max_phase + 1]
+        return {
+            "clear_rate": sum(end_hp, zero),
+            "death_phases": [zero] + [self._deaths[p] for p in range(1, max_phase + 1)],
+            "end_hp": list(end_hp),
+        }
+
+    def phase_kernel(self, phase: int) -> Kernel:
+        """フェーズ1回分の遷移行列"""
+        num = self.number
+        em = self.event_manager
+        if phase == em.max_phase:
+            return self.battle_kernel(em.boss_target(), BOSS_DAMAGE)
+
+        weights = [num(w) for w in em.event_weights(phase)]
+        total = sum(weights)
+        probs = {event_id: w / total for event_id, w in zip(range(1, 6), weights)}
+
+        # 道・休憩（と選ばなかった水場・宝箱）は何も起こらない
+        kernel = self._identity()
+        stay = 1 - probs[EVENT_BATTLE]
+        if self.drink:
+            stay -= probs[EVENT_WATER]
+        if self.open_chest:
+            stay -= probs[EVENT_CHEST]
+        self._scale(kernel, stay)
+
+        if self.drink and probs[EVENT_WATER]:
+            heal = num(WATER_HEAL_CHANCE)
+            for h in range(1, MAX_HP + 1):
+                kernel[h][min(h + 1, MAX_HP)] += probs[EVENT_WATER] * heal
+                kernel[h][h - 1] += probs[EVENT_WATER] * (1 - heal)
+
+        battle_prob = probs[EVENT_BATTLE]
+        if self.open_chest and probs[EVENT_CHEST]:
+            third = probs[EVENT_CHEST] / 3
+            for h in range(1, MAX_HP + 1):
+                kernel[h][h] += third  # 空
+                kernel[h][min(h + 1, MAX_HP)] += third  # 回復
+            battle_prob += third  # 罠
+
+        if battle_prob:
+            candidates = em.enemy_candidates(phase)
+            if not candidates:
+                raise ValueError(f"フェーズ{phase}に登場する敵がいない")
+            share = battle_prob / len(candidates)
+            for _, target in candidates:
+                battle = self.battle_kernel(target, 1)
+                for h in range(1, MAX_HP + 1):
+                    for h2 in range(MAX_HP + 1):
+                        kernel[h][h2] += share * battle[h][h2]
+        return kernel
+
+    def battle_kernel(self, target: int, damage: int) -> Kernel:
+        """勝つか倒れるまで続く戦闘1回分の遷移行列（勝利後の回復込み）"""
+        key = (target, damage)
+        if key in self._battle_kernels:
+            return self._battle_kernels[key]
+        num = self.number
+        win = num(max(0, min(target, 10))) / 10
+        lose = 1 - win
+        heal = num(HEAL_CHANCE)
+        kernel = self._identity()
+        self._scale(kernel, 0)
+        for h in range(1, MAX_HP + 1):
+            reach = num(1)  # ここまで負け続ける確率
+            hp = h
+            while hp > 0:
+                kernel[h][hp] += reach * win * (1 - heal)
+                kernel[h][min(hp + 1, MAX_HP)] += reach * win * heal
+                reach *= lose
+                hp -= damage
+            kernel[h][0] += reach
+        self._battle_kernels[key] = kernel
+        return kernel
+
+    def _identity(self) -> Kernel:
+        """単位行列（行0は使わない）"""
+        zero, one = self.number(0), self.number(1)
+        return [[one if h == h2 else zero for h2 in range(MAX_HP + 1)] for h in range(MAX_HP + 1)]
+
+    @staticmethod
+    def _scale(kernel: Kernel, factor) -> None:
+        for row in kernel:
+            for h2 in range(len(row)):
+                row[h2] *= factor
+
+
+if __name__ == "__main__":
+    result = OutcomeSolver().solve()
+    print(f"クリア確率: {result['clear_rate']} ({float(result['clear_rate']):.6%})")
+    for phase in range(1, len(result["death_phases"])):
+        print(f"フェーズ{phase:2d}で死亡: {float(result['death_phases'][phase]):.6%}")
+    for hp in range(1, MAX_HP + 1):
+        print(f"HP{hp}でクリア: {float(result['end_hp'][hp]):.6%}")
@@ -0,0 +1,296 @@
+"""プレイのテレメトリ（記録と集計）
+
+GameEngine.telemetry に TelemetrySink を設定すると、ラン開始・イベント・選択・戦闘・
+ダイス・HPの変化・ラン終了を固定長のバイナリレコードとして追記する。レコードは
+メモリにためてまとめて別スレッドに渡し、ファイルへの書き込みはそのスレッドで行う
+（フレームループは書き込みを待たない）。
+
+集計は固定サイズのチャンクで読み進めるので、ファイルが何GBでもメモリ使用量は
+同時に記録していたセッション数にしか依存しない。
+
+    python telemetry.py analyze play.tlm [play2.tlm ...] [--json]
+"""
+import argparse
+import json
+import queue
+import random
+import struct
+import sys
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from engine import (
+    MAX_PHASE, MAX_HP, EVENT_PATH, EVENT_BATTLE, EVENT_WATER, EVENT_CHEST,
+    TELEMETRY_START, TELEMETRY_EVENT, TELEMETRY_CHOICE, TELEMETRY_BATTLE, TELEMETRY_DICE, TELEMETRY_HP,
+    TELEMETRY_END, EventManager,
+)
+
+MAGIC = b"MRPT\x01\x00\x00\x00"  # ファイル先頭（形式名とバージョン）
+# run_id, kind, phase, hp, a, b
+RECORD = struct.Struct("<QBHBBB")
+RUN_BITS = 20  # ランIDの下位ビット（プロセス内の通し番号）。上位ビットはプロセス（セッション）ごと
+BATCH_RECORDS = 4096  # これだけたまったら書き込みスレッドに渡す
+MAX_PENDING_BATCHES = 64  # 書き込みが追いつかないときにためておくバッチ数（超えた分は捨てる）
+READ_RECORDS = 1 << 16  # 集計時に1回で読むレコード数
+
+CHOICE_NAMES = {
+    (EVENT_PATH, 0): "道: 左", (EVENT_PATH, 1): "道: 右",
+    (EVENT_WATER, 0): "水場: 飲む", (EVENT_WATER, 1): "水場: 飲まない",
+    (EVENT_CHEST, 0): "宝箱: 開ける", (EVENT_CHEST, 1): "宝箱: 開けない",
+}
+
+
+class TelemetrySink:
+    """テレメトリの書き込み先
+
+    record はバッファに追記するだけで、BATCH_RECORDS 件ごとにバッチを書き込みスレッドの
+    キューに入れる。キューがいっぱいならバッチを捨てて dropped_records に数える。
+    """
+    def __init__(self, path: str, batch_records: int = BATCH_RECORDS,
+                 max_pending: int = MAX_PENDING_BATCHES):
+        self.path = path
+        self.batch_bytes = batch_records * RECORD.size
+        self.buffer = bytearray()
+        self.queue: "queue.Queue[Optional[bytes]]" = queue.Queue(max_pending)
+        self.dropped_records = 0
+        # ランIDの上位ビットはプロセスごとにランダム（複数の記録を1ファイルに追記しても混ざらない）
+        self.run_id = random.getrandbits(64 - RUN_BITS) << RUN_BITS
+        self.thread = threading.Thread(target=self._write_loop, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def record(self, kind: int, phase: int, hp: int, a: int = 0, b: int = 0) -> None:
+        """1件記録する"""
+        if kind == TELEMETRY_START:
+            self.run_id += 1
+        self.buffer += RECORD.pack(self.run_id, kind, phase, hp, a, b)
+        if len(self.buffer) >= self.batch_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """バッファの内容を書き込みスレッドに渡す（待たない）"""
+        if not self.buffer:
+            return
+        try:
+            self.queue.put_nowait(bytes(self.buffer))
+        except queue.Full:
+            self.dropped_records += len(self.buffer) // RECORD.size
+        self.buffer.clear()
+
+    def close(self) -> None:
+        """残りを書き込んでスレッドを止める（終了時に呼ぶ）"""
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write_loop(self) -> None:
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                f.write(MAGIC)
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    break
+                f.write(batch)
+                f.flush()
+
+
+def read_records(path: str, chunk_records: int = READ_RECORDS) -> Iterator[Tuple[int, int, int, int, int, int]]:
+    """ファイルのレコードを先頭から順に返す（一度に読むのは chunk_records 件だけ）"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"テレメトリのファイルではない: {path}")
+        chunk_bytes = chunk_records * RECORD.size
+        rest = b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            if rest:
+                data = rest + data
+            usable = len(data) - len(data) % RECORD.size
+            rest = data[usable:]
+            yield from RECORD.iter_unpack(memoryview(data)[:usable])
+
+
+class RunState:
+    """集計中の1ラン分の状態"""
+    __slots__ = ("enemies", "choices", "enemy", "hp_cause")
+
+    def __init__(self):
+        self.enemies = set()
+        self.choices = set()
+        self.enemy = None  # 最後に戦った敵ID
+        self.hp_cause = 0  # 最後にHPが変わった原因のイベントID
+
+
+class TelemetryAnalyzer:
+    """テレメトリの集計
+
+    クリアかゲームオーバーで終わったランだけを集計し、終わっていないラン
+    （途中で閉じたもの）は abandoned に数える。同じセッションで次のランが始まったら前の
+    ランを、ファイルの終わりではそのファイルで終わっていないランを中断として捨てるので、
+    保持するのはセッションごとに進行中の1ランだけ。フェーズ別の集計は、長いキャンペーンの
+    記録が来たらそのフェーズまで伸ばす。
+    """
+    def __init__(self):
+        self.runs = 0
+        self.wins = 0
+        self.reached = [0] * (MAX_PHASE + 1)
+        self.cleared_from = [0] * (MAX_PHASE + 1)  # そのフェーズに到達してクリアしたラン数
+        self.deaths = [0] * (MAX_PHASE + 1)
+        self.end_hp = [0] * (MAX_HP + 1)
+        self.events = [0] * 6
+        # 敵ID -> [戦闘数, ダイス回数, ダイスの勝ち数, その敵に倒されたラン数, 戦ったラン数, そのうちクリア数]
+        self.enemies: Dict[int, List[int]] = {}
+        # (イベントID, 選択) -> [選択回数, 選んだラン数, そのうちクリア数]
+        self.choices: Dict[Tuple[int, int], List[int]] = {}
+        self.active: Dict[int, RunState] = {}
+        self.session_runs: Dict[int, int] = {}  # セッション -> 進行中のランID
+        self.abandoned = 0
+        self.records = 0
+
+    def feed(self, records: Iterable[Tuple[int, int, int, int, int, int]]) -> None:
+        """レコードを集計に加える"""
+        active = self.active
+        for run_id, kind, phase, hp, a, b in records:
+            self.records += 1
+            if kind == TELEMETRY_START:
+                previous = self.session_runs.get(run_id >> RUN_BITS)
+                if previous is not None and active.pop(previous, None) is not None:
+                    self.abandoned += 1  # 終了が記録されないまま次のランが始まった
+                self.session_runs[run_id >> RUN_BITS] = run_id
+                active[run_id] = RunState()
+                continue
+            run = active.get(run_id)
+            if run is None:
+                continue  # 開始が記録されていないラン
+            if kind == TELEMETRY_EVENT:
+                if 0 < a < len(self.events):
+                    self.events[a] += 1
+            elif kind == TELEMETRY_CHOICE:
+                if (a, b) in CHOICE_NAMES:
+                    self.choices.setdefault((a, b), [0, 0, 0])[0] += 1
+                    run.choices.add((a, b))
+            elif kind == TELEMETRY_BATTLE:
+                self.enemies.setdefault(a, [0] * 6)[0] += 1
+                run.enemies.add(a)
+                run.enemy = a
+            elif kind == TELEMETRY_DICE:
+                stats = self.enemies.setdefault(255 if run.enemy is None else run.enemy, [0] * 6)
+                stats[1] += 1
+                stats[2] += b
+            elif kind == TELEMETRY_HP:
+                run.hp_cause = b
+            elif kind == TELEMETRY_END:
+                self._finish(run_id, run, phase, hp, bool(a))
+
+    def _finish(self, run_id: int, run: RunState, phase: int, hp: int, cleared: bool) -> None:
+        del self.active[run_id]
+        if self.session_runs.get(run_id >> RUN_BITS) == run_id:
+            del self.session_runs[run_id >> RUN_BITS]
+        phase = max(phase, 1)
+        if phase >= len(self.reached):
+            grow = [0] * (phase + 1 - len(self.reached))
+            self.reached += grow
+            self.cleared_from += grow
+            self.deaths += grow
+        self.runs += 1
+        for p in range(1, phase + 1):
+            self.reached[p] += 1
+            self.cleared_from[p] += cleared
+        if cleared:
+            self.wins += 1
+            self.end_hp[min(hp, MAX_HP)] += 1
+        else:
+            self.deaths[phase] += 1
+            if run.hp_cause == EVENT_BATTLE and run.enemy is not None:
+                self.enemies[run.enemy][3] += 1
+        for enemy_id in run.enemies:
+            self.enemies[enemy_id][4] += 1
+            self.enemies[enemy_id][5] += cleared
+        for key in run.choices:
+            self.choices[key][1] += 1
+            self.choices[key][2] += cleared
+
+    def feed_file(self, path: str) -> None:
+        self.feed(read_records(path))
+        self.end_stream()
+
+    def end_stream(self) -> None:
+        """記録の終わり: 終わっていないランを中断として捨てる"""
+        self.abandoned += len(self.active)
+        self.active.clear()
+        self.session_runs.clear()
+
+    def report(self, event_manager: Optional[EventManager] = None) -> Dict[str, object]:
+        """集計結果"""
+        em = event_manager or EventManager()
+        names = {enemy_id: name for enemy_id, (name, _, _, _) in enumerate(em.enemies)}
+        return {
+            "records": self.records,
+            "runs": self.runs,
+            "wins": self.wins,
+            "clear_rate": self.wins / self.runs if self.runs else 0.0,
+            "abandoned": self.abandoned + len(self.active),
+            "phases": [
+                {"phase": p, "reached": self.reached[p], "deaths": self.deaths[p],
+                 "clear_rate": self.cleared_from[p] / self.reached[p] if self.reached[p] else 0.0}
+                for p in range(1, len(self.reached))
+            ],
+            "end_hp": self.end_hp,
+            "events": {em.events[event_id][0]: count for event_id, count in enumerate(self.events) if event_id},
+            "enemies": [
+                {"enemy": names.get(enemy_id, "不明"), "battles": battles, "rolls": rolls,
+                 "roll_win_rate": wins / rolls if rolls else 0.0, "killed_runs": killed,
+                 "runs": runs, "clear_rate": cleared / runs if runs else 0.0}
+                for enemy_id, (battles, rolls, wins, killed, runs, cleared) in sorted(self.enemies.items())
+            ],
+            "choices": [
+                {"choice": CHOICE_NAMES[key], "count": count, "runs": runs,
+                 "clear_rate": cleared / runs if runs else 0.0}
+                for key, (count, runs, cleared) in sorted(self.choices.items())
+            ],
+        }
+
+
+def format_report(report: Dict[str, object]) -> str:
+    """集計結果を表示用の文字列にする"""
+    lines = [
+        f"レコード: {report['records']}  ラン: {report['runs']}  中断: {report['abandoned']}",
+        f"クリア: {report['wins']} ({report['clear_rate']:.2%})",
+        "",
+        "フェーズ      到達     死亡  到達後のクリア率",
+    ]
+    for item in report["phases"]:
+        lines.append(f"{item['phase']:>4}  {item['reached']:>10} {item['deaths']:>8}  {item['clear_rate']:>8.2%}")
+    lines += ["", "敵            戦闘   ダイス勝率  倒されたラン  戦ったランのクリア率"]
+    for item in report["enemies"]:
+        lines.append(f"{item['enemy']:<8} {item['battles']:>8}  {item['roll_win_rate']:>8.2%}  "
+                     f"{item['killed_runs']:>10}  {item['clear_rate']:>8.2%}")
+    lines += ["", "選択              回数   選んだランのクリア率"]
+    for item in report["choices"]:
+        lines.append(f"{item['choice']:<12} {item['count']:>8}  {item['clear_rate']:>8.2%}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="洞窟探検RPG テレメトリ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    analyze = sub.add_parser("analyze", help="テレメトリのファイルを集計する")
+    analyze.add_argument("paths", nargs="+", metavar="PATH")
+    analyze.add_argument("--json", action="store_true", help="JSONで出力する")
+    args = parser.parse_args()
+
+    analyzer = TelemetryAnalyzer()
+    for path in args.paths:
+        analyzer.feed_file(path)
+    report = analyzer.report()
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""テキストのレイアウト（幅に合わせた改行とページ分け）
+
+フォントで実際に測った幅で行を折り返す。日本語の禁則処理（行頭に句読点・閉じ括弧・
+小書きの仮名を置かない、行末に開き括弧を置かない）を行い、英数字の単語は途中で切らない。
+入りきらない行数はページに分ける。
+
+結果は (文字列, フォント, 幅, 行数) をキーにキャッシュするので、同じメッセージの
+レイアウトを毎フレーム計算し直すことはない。pygame には依存せず、幅は measure
+（文字列 -> ピクセル幅）で測る。
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+LAYOUT_CACHE_SIZE = 128  # キャッシュするレイアウトの最大数
+
+# 行頭に置かない文字（前の文字と一緒に送る）
+NO_LINE_START = frozenset(
+    "、。，．,.・：；:;？！?!…‥ー～〜々ゝゞヽヾ"
+    "」』）〕］｝〉》】)]}"
+    "ぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶ"
+)
+# 行末に置かない文字（次の文字と一緒に送る）
+NO_LINE_END = frozenset("「『（〔［｛〈《【([{")
+
+Pages = Tuple[Tuple[str, ...], ...]
+
+
+def _is_word_char(char: str) -> bool:
+    """途中で改行しない英数字・記号（ASCIIの空白以外）"""
+    return "!" <= char <= "~"
+
+
+def split_units(paragraph: str) -> List[str]:
+    """改行してよい位置で区切った、それ以上分けない単位の列
+
+    英数字の単語と空白はそれぞれ1単位、それ以外（日本語）は1文字1単位。禁則文字は
+    前後の単位とつなげる。
+    """
+    units: List[str] = []
+    i = 0
+    while i < len(paragraph):
+        char = paragraph[i]
+        j = i + 1
+        if _is_word_char(char):
+            while j < len(paragraph) and _is_word_char(paragraph[j]):
+                j += 1
+        elif char == " ":
+            while j < len(paragraph) and paragraph[j] == " ":
+                j += 1
+        units.append(paragraph[i:j])
+        i = j
+
+    merged: List[str] = []
+    glue = False  # 直前の単位が行末禁則文字で終わっている
+    for unit in units:
+        if merged and (glue or (unit[0] in NO_LINE_START and merged[-1] != " " * len(merged[-1]))):
+            merged[-1] += unit
+        else:
+            merged.append(unit)
+        glue = unit[-1] in NO_LINE_END
+    return merged
+
+
+def break_lines(text: str, measure: Callable[[str], int], width: int) -> List[str]:
+    """text を幅 width に収まる行に分ける（"\\n" は必ず改行する）
+
+    1単位だけで幅を超える場合はその単位を文字の途中で分ける。
+    """
+    lines: List[str] = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for unit in split_units(paragraph):
+            candidate = line + unit
+            if measure(candidate.rstrip(" ")) <= width:
+                line = candidate
+                continue
+            if line.strip(" "):
+                lines.append(line.rstrip(" "))
+            line = unit.lstrip(" ")
+            # 単位だけで幅を超える（長い単語など）: 入るところで切る
+            while line and measure(line) > width:
+                cut = 1
+                while cut < len(line) and measure(line[:cut + 1]) <= width:
+                    cut += 1
+                lines.append(line[:cut])
+                line = line[cut:]
+        lines.append(line.rstrip(" "))
+    return lines
+
+
+def paginate(lines: List[str], max_lines: int) -> Pages:
+    """行を max_lines 行ずつのページに分ける（空でも1ページはある）"""
+    if not lines:
+        return ((),)
+    return tuple(tuple(lines[i:i + max_lines]) for i in range(0, len(lines), max_lines))
+
+
+class TextLayout:
+    """レイアウト結果のLRUキャッシュ
+
+    font は size(text) -> (幅, 高さ) を持つもの（pygame.font.Font）。
+    """
+    def __init__(self, max_entries: int = LAYOUT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.pages: "OrderedDict[tuple, Pages]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def layout(self, font, text: str, width: int, max_lines: Optional[int] = None) -> Pages:
+        """text を幅 width で折り返し、max_lines 行ずつのページにしたもの（None なら1ページ）"""
+        key = (text, font, width, max_lines)
+        pages = self.pages.get(key)
+        if pages is not None:
+            self.hits += 1
+            self.pages.move_to_end(key)
+            return pages
+
+        self.misses += 1
+        lines = break_lines(text, lambda s: font.size(s)[0], width)
+        pages = paginate(lines, max_lines or max(len(lines), 1))
+        self.pages[key] = pages
+        if len(self.pages) > self.max_entries:
+            self.pages.popitem(last=False)  # 最も古く使われたものを捨てる
+        return pages
+
+    def clear(self) -> None:
+        """キャッシュと統計をリセット"""
+        self.pages.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット/ミス数"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.pages)}